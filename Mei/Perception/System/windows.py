@@ -1,51 +1,168 @@
 from ...core.config import TabInfo, WindowInfo, ExtendedWindowInfo
 from ...core.task import AppBridge
 import os
+import ctypes
+import logging
+import threading
+from ctypes import wintypes
+from dataclasses import replace
 from typing import Dict, List, Optional
 import win32gui, win32con, win32process, win32api
-import psutil
 from ...core.events import EventType, emit
 
+# psutil is only needed to resolve process names; imported on first use
+psutil = None
+
+def _load_psutil():
+    global psutil
+    if psutil is None:
+        import psutil as _psutil
+        psutil = _psutil
+    return psutil
+
+# WinEvent constants (winuser.h)
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+OBJID_WINDOW = 0
+GA_ROOT = 2
+CHILDID_SELF = 0
+WM_QUIT = 0x0012
+
+SW_SHOWMAXIMIZED = win32con.SW_SHOWMAXIMIZED
+SKIP_WINDOW_TITLES = frozenset({"program manager", "windows input experience",
+                                "msctfime ui", "default ime"})
+
+if hasattr(ctypes, "WINFUNCTYPE"):
+    WINEVENTPROC = ctypes.WINFUNCTYPE(
+        None,
+        wintypes.HANDLE,  # hWinEventHook
+        wintypes.DWORD,   # event
+        wintypes.HWND,    # hwnd
+        wintypes.LONG,    # idObject
+        wintypes.LONG,    # idChild
+        wintypes.DWORD,   # dwEventThread
+        wintypes.DWORD,   # dwmsEventTime
+    )
+else:
+    WINEVENTPROC = None
+
 class WindowManager:
     def __init__(self):
+        self._log = logging.getLogger('WindowManager')
         self._bridges: Dict[str, AppBridge] = {}
         self._focus_history:List[int] = []
         self._max_history = 50
-        # Cache for performance - 
+        # Cache for performance - kept up to date by WinEvent hooks
         self._window_cache:Dict[int, WindowInfo] = {}
-        self._cache_timeout = 1.0 # seconds
-        self._last_cache_time  = 0
+        self._cache_lock = threading.Lock()
+
+        # Push-based window tracking (falls back to polling when unavailable)
+        self._hook_active = False
+        self._hook_handle = None
+        self._hook_thread: Optional[threading.Thread] = None
+        self._hook_thread_id = 0
+        self._hook_proc = None
+        self._start_event_hook()
 
     def register_bridge(self,bridge:AppBridge)->None:
         for process_name in bridge.supported_process:
             self._bridges[process_name.lower()] = bridge
-            print(f"Registered {bridge.app_type} bridge")
+        self._log.debug("Registered %s bridge", bridge.app_type)
 
     def unregister_bridge(self, bridge:AppBridge) ->None:
         for process_name in bridge.supported_process:
-            del self._bridges[process_name]
-        print(f"Process: {bridge.app_type} removed from bridge")
+            self._bridges.pop(process_name.lower(), None)
+        self._log.debug("Process: %s removed from bridge", bridge.app_type)
     
-    def _get_bridge(self, process_name: str)-> Optional[AppBridge]:
-        bridge = self._bridges.get(process_name.lower())
+    def _get_bridge(self, process_name_lower: str)-> Optional[AppBridge]:
+        # Expects WindowInfo.process_name_lower, which is already lowered
+        bridge = self._bridges.get(process_name_lower)
         if bridge and bridge.is_connected:
             return bridge
         else:
             return None
     
     def get_all_windows(self, include_hidden = False) -> List[WindowInfo]:
+        # Hook keeps the cache current, so no enumeration is needed
+        if self._hook_active and not include_hidden:
+            with self._cache_lock:
+                cache = dict(self._window_cache)
+            return self._in_z_order(cache)
+        return self._enumerate_windows(include_hidden)
+
+    def _in_z_order(self, cache:Dict[int, WindowInfo]) -> List[WindowInfo]:
+        # Callers expect EnumWindows order (topmost first). Walking the
+        # z-order chain is one GetWindow call per hwnd, far cheaper than
+        # rebuilding every WindowInfo.
+        results: List[WindowInfo] = []
+        try:
+            hwnd = win32gui.GetWindow(win32gui.GetDesktopWindow(), win32con.GW_CHILD)
+            while hwnd and cache:
+                info = cache.pop(hwnd, None)
+                if info is not None:
+                    results.append(info)
+                hwnd = win32gui.GetWindow(hwnd, win32con.GW_HWNDNEXT)
+        except Exception:
+            return self._enumerate_windows()
+        # Whatever the walk did not reach is no longer a top-level window
+        if cache:
+            with self._cache_lock:
+                for hwnd in cache:
+                    self._window_cache.pop(hwnd, None)
+        return results
+
+    def _enumerate_windows(self, include_hidden = False) -> List[WindowInfo]:
         results: List[WindowInfo] = []
+        # Resolved once; the callback runs for every top-level hwnd. This is
+        # _is_real_window + _build_window_info inlined, so title and rect are
+        # read once per window and no win32 attribute lookup is repeated
+        append = results.append
+        is_window_visible = win32gui.IsWindowVisible
+        get_window_text = win32gui.GetWindowText
+        get_window_rect = win32gui.GetWindowRect
+        is_iconic = win32gui.IsIconic
+        get_window_placement = win32gui.GetWindowPlacement
+        get_window_thread_process_id = win32process.GetWindowThreadProcessId
+        process_names: Dict[int, str] = {}
 
-        def enum_callback(hwnd, results):
+        def enum_callback(hwnd, _):
             try:
+                is_visible = is_window_visible(hwnd)
+                title = get_window_text(hwnd)
+                left, top, right, bottom = get_window_rect(hwnd)
                 # Skip if not a real window
                 if not include_hidden:
-                    if not self._is_real_window(hwnd):
+                    if (not is_visible or not title or not title.strip()
+                            or title.lower() in SKIP_WINDOW_TITLES
+                            or right - left <= 0 or bottom - top <= 0):
                         return True
-                
-                info = self._build_window_info(hwnd)
-                if info:
-                    results.append(info)
+
+                _, pid = get_window_thread_process_id(hwnd)
+                # Processes usually own several windows; one psutil lookup each
+                process_name = process_names.get(pid)
+                if process_name is None:
+                    try:
+                        process_name = _load_psutil().Process(pid).name()
+                    except:
+                        process_name = "unknown"
+                    process_names[pid] = process_name
+                append(WindowInfo(hwnd=hwnd,
+                                  title=title,
+                                  process_name=process_name,
+                                  pid=pid,
+                                  x=left,
+                                  y=top,
+                                  width=right - left,
+                                  height=bottom - top,
+                                  is_visible=is_visible,
+                                  is_minimized=is_iconic(hwnd),
+                                  is_maximized=(get_window_placement(hwnd)[1] == SW_SHOWMAXIMIZED)
+                                  ))
             except:
                 pass
             return True
@@ -57,7 +174,7 @@ class WindowManager:
         if not window:
             return None
         # Checking for app specific bridge
-        bridge = self._get_bridge(window.process_name)
+        bridge = self._get_bridge(window.process_name_lower)
         
         #if bridge exists and connected:
         if bridge and bridge.is_connected:
@@ -85,6 +202,13 @@ class WindowManager:
             if hwnd ==0:
                 return None
             self._update_focus_history(hwnd)
+            if self._hook_active:
+                # Title, rect and state are kept current by the hook; skips the
+                # process lookup and placement queries on every foreground check
+                with self._cache_lock:
+                    cached = self._window_cache.get(hwnd)
+                if cached is not None:
+                    return cached
             return self._build_window_info(hwnd)
         except:
             return None
@@ -112,18 +236,16 @@ class WindowManager:
     def find_windows(self,query:str) ->List[WindowInfo]:
         query = query.lower().strip()
         all_windows = self.get_all_windows()
-        matches = []
+        # Process-name matches rank above title matches
+        proc_hits = []
+        title_hits = []
         for window in all_windows:
-            proc_name_clean = window.process_name.lower().replace(".exe", "")
-            if query in proc_name_clean:
-                matches.insert(0, window)
-                continue
+            proc_name_clean = window.process_name_lower.replace(".exe", "")
             if query in proc_name_clean:
-                matches.append(window)
-                continue
-            if query in window.title.lower():
-                matches.append(window)
-        return matches
+                proc_hits.append(window)
+            elif query in window.title.lower():
+                title_hits.append(window)
+        return proc_hits + title_hits
     
     def find_tab(self,query:str)->Optional[tuple[WindowInfo, TabInfo]]:
         query = query.lower().strip()
@@ -133,7 +255,7 @@ class WindowManager:
             if query in window.title.lower():
                 return (window, None)
             
-            bridge = self._get_bridge(window.process_name)
+            bridge = self._get_bridge(window.process_name_lower)
             if bridge and bridge.is_connected:
                 tabs = bridge.get_tabs(window.hwnd)
                 for tab in tabs:
@@ -191,7 +313,7 @@ class WindowManager:
         if not self.focus_window(hwnd):
             return False
         
-        bridge = self._get_bridge(process_name=window.process_name)
+        bridge = self._get_bridge(process_name_lower=window.process_name_lower)
         if bridge and bridge.is_connected:
             return bridge.switch_to_tab(hwnd, tab_id)
         else:
@@ -234,7 +356,7 @@ class WindowManager:
         if not window:
             return False
 
-        bridge = self._get_bridge(window.process_name)
+        bridge = self._get_bridge(window.process_name_lower)
         if bridge and bridge.is_connected:
             closed =  bridge.close_tab(hwnd,tab_id=tab_id)
             if closed:
@@ -288,19 +410,19 @@ class WindowManager:
             title = win32gui.GetWindowText(hwnd)
             _,pid =win32process.GetWindowThreadProcessId(hwnd)
             try:
-                process = psutil.Process(pid)
+                process = _load_psutil().Process(pid)
                 process_name = process.name()
             except:
                 process_name = "unknown"
-            rect = win32gui.GetWindowRect(hwnd)
-            x,y = rect[0], rect[1]
-            width = rect[2] - rect[0]
-            height = rect[3] - rect[1]
+            left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+            x,y = left, top
+            width = right - left
+            height = bottom - top
 
             is_visible = win32gui.IsWindowVisible(hwnd)
             is_minimized = win32gui.IsIconic(hwnd)
             placement = win32gui.GetWindowPlacement(hwnd)
-            is_maximized = (placement[1] == win32con.SW_SHOWMAXIMIZED)
+            is_maximized = (placement[1] == SW_SHOWMAXIMIZED)
             return WindowInfo(hwnd=hwnd, 
                               title=title, 
                               process_name=process_name, 
@@ -316,6 +438,130 @@ class WindowManager:
         except:
             return None
 
+    def _refresh_placement(self, window:WindowInfo)->Optional[WindowInfo]:
+        try:
+            hwnd = window.hwnd
+            left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+            if right - left <= 0 or bottom - top <= 0:
+                return None
+            placement = win32gui.GetWindowPlacement(hwnd)
+            return replace(window,
+                           x=left,
+                           y=top,
+                           width=right - left,
+                           height=bottom - top,
+                           is_visible=win32gui.IsWindowVisible(hwnd),
+                           is_minimized=win32gui.IsIconic(hwnd),
+                           is_maximized=(placement[1] == SW_SHOWMAXIMIZED)
+                           )
+        except:
+            return None
+
+    def _start_event_hook(self) -> None:
+        if WINEVENTPROC is None:
+            return
+        ready = threading.Event()
+        self._hook_thread = threading.Thread(
+            target=self._run_event_hook,
+            args=(ready,),
+            name="WindowEventHook",
+            daemon=True
+        )
+        self._hook_thread.start()
+        ready.wait(timeout=2.0)
+
+    def _run_event_hook(self, ready: threading.Event) -> None:
+        # WINEVENT_OUTOFCONTEXT callbacks are delivered through the message
+        # queue of the thread that installed the hook, so it needs its own loop.
+        try:
+            user32 = ctypes.windll.user32
+            kernel32 = ctypes.windll.kernel32
+            user32.SetWinEventHook.restype = wintypes.HANDLE
+
+            self._hook_proc = WINEVENTPROC(self._on_win_event)
+            self._hook_handle = user32.SetWinEventHook(
+                EVENT_OBJECT_CREATE,
+                EVENT_OBJECT_NAMECHANGE,
+                0,
+                self._hook_proc,
+                0,
+                0,
+                WINEVENT_OUTOFCONTEXT
+            )
+            if not self._hook_handle:
+                ready.set()
+                return
+
+            self._hook_thread_id = kernel32.GetCurrentThreadId()
+
+            # Prime the cache once; the hook keeps it current from here on
+            initial = {w.hwnd: w for w in self._enumerate_windows()}
+            with self._cache_lock:
+                self._window_cache = initial
+            self._hook_active = True
+        except Exception as e:
+            self._log.warning("WinEvent hook unavailable, polling instead: %s", e)
+            ready.set()
+            return
+        ready.set()
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        self._hook_active = False
+        user32.UnhookWinEvent(self._hook_handle)
+        self._hook_handle = None
+
+    def _on_win_event(self, hook, event, hwnd, id_object, id_child, thread_id, event_time) -> None:
+        # Only top-level window objects, not carets/cursors/child controls
+        if not hwnd or id_object != OBJID_WINDOW or id_child != CHILDID_SELF:
+            return
+        try:
+            if event in (EVENT_OBJECT_DESTROY, EVENT_OBJECT_HIDE):
+                with self._cache_lock:
+                    removed = self._window_cache.pop(hwnd, None)
+                if removed is not None:
+                    emit(event_type=EventType.WINDOW_CLOSED, source="WindowManager", hwnd=hwnd)
+                return
+
+            # OBJID_WINDOW also fires for child controls; keep only the
+            # top-level windows EnumWindows would report
+            if win32gui.GetAncestor(hwnd, GA_ROOT) != hwnd:
+                return
+
+            with self._cache_lock:
+                cached = self._window_cache.get(hwnd)
+            if event == EVENT_OBJECT_LOCATIONCHANGE and cached is not None:
+                # Fires for every frame of a drag or resize; pid, process
+                # name and title are unchanged, so skip the psutil lookup
+                info = self._refresh_placement(cached)
+            else:
+                info = self._build_window_info(hwnd) if self._is_real_window(hwnd) else None
+            with self._cache_lock:
+                if info is None:
+                    known = self._window_cache.pop(hwnd, None) is not None
+                else:
+                    known = hwnd in self._window_cache
+                    self._window_cache[hwnd] = info
+
+            # Location changes fire continuously while dragging; only
+            # structural changes are announced on the event bus.
+            if event != EVENT_OBJECT_LOCATIONCHANGE and (info is not None or known):
+                emit(event_type=EventType.WINDOW_CHANGED, source="WindowManager", hwnd=hwnd)
+        except Exception:
+            pass
+
+    def stop_event_hook(self) -> None:
+        if self._hook_thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._hook_thread_id, WM_QUIT, 0, 0)
+            self._hook_thread_id = 0
+        if self._hook_thread is not None:
+            self._hook_thread.join(timeout=2.0)
+            self._hook_thread = None
+        self._hook_active = False
+
     def _get_most_recent(self, windows: List[WindowInfo]) -> Optional[WindowInfo]:
         for hwnd in self._focus_history:
             for window in windows:
@@ -330,21 +576,17 @@ class WindowManager:
         
         # Must have title
         title = win32gui.GetWindowText(hwnd)
-        if not title or len(title.strip()) == 0:
+        if not title or not title.strip():
             return False
         
         # Skip known system windows
-        skip_titles = ["program manager", "windows input experience", 
-                    "msctfime ui", "default ime"]
-        if title.lower() in skip_titles:
+        if title.lower() in SKIP_WINDOW_TITLES:
             return False
         
         # Must have size
         try:
-            rect = win32gui.GetWindowRect(hwnd)
-            width = rect[2] - rect[0]
-            height = rect[3] - rect[1]
-            if width <= 0 or height <= 0:
+            left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+            if right - left <= 0 or bottom - top <= 0:
                 return False
         except:
             return False
@@ -14,8 +14,13 @@ class Omniparser(object):
         print('Omniparser initialized!!!')
 
     def parse(self, image_base64: str):
+        # Remote entry point: the API server receives the screenshot as base64
         image_bytes = base64.b64decode(image_base64)
         image = Image.open(io.BytesIO(image_bytes))
+        return self.parse_image(image)
+
+    def parse_image(self, image: Image.Image):
+        # In-process entry point: no encode/decode round-trip
         print('image size:', image.size)
         
         box_overlay_ratio = max(image.size) / 3200
@@ -1,6 +1,5 @@
 # from ultralytics import YOLO
 import os
-import io
 import base64
 import time
 from PIL import Image, ImageDraw, ImageFont
@@ -38,27 +37,30 @@ import torchvision.transforms as T
 from util.box_annotator import BoxAnnotator 
 
 
-def get_caption_model_processor(model_name, model_name_or_path="Salesforce/blip2-opt-2.7b", device=None):
+def get_caption_model_processor(model_name, model_name_or_path="Salesforce/blip2-opt-2.7b", device=None, torch_dtype=None):
     if not device:
         device = "cuda" if torch.cuda.is_available() else "cpu"
+    # torch_dtype overrides the default (fp32 on CPU, fp16 on CUDA)
+    if torch_dtype is None:
+        torch_dtype = torch.float32 if device == 'cpu' else torch.float16
     if model_name == "blip2":
         from transformers import Blip2Processor, Blip2ForConditionalGeneration
         processor = Blip2Processor.from_pretrained("Salesforce/blip2-opt-2.7b")
         if device == 'cpu':
             model = Blip2ForConditionalGeneration.from_pretrained(
-            model_name_or_path, device_map=None, torch_dtype=torch.float32
+            model_name_or_path, device_map=None, torch_dtype=torch_dtype
         ) 
         else:
             model = Blip2ForConditionalGeneration.from_pretrained(
-            model_name_or_path, device_map=None, torch_dtype=torch.float16
+            model_name_or_path, device_map=None, torch_dtype=torch_dtype
         ).to(device)
     elif model_name == "florence2":
         from transformers import AutoProcessor, AutoModelForCausalLM 
         processor = AutoProcessor.from_pretrained("microsoft/Florence-2-base", trust_remote_code=True)
         if device == 'cpu':
-            model = AutoModelForCausalLM.from_pretrained(model_name_or_path, torch_dtype=torch.float32, trust_remote_code=True)
+            model = AutoModelForCausalLM.from_pretrained(model_name_or_path, torch_dtype=torch_dtype, trust_remote_code=True)
         else:
-            model = AutoModelForCausalLM.from_pretrained(model_name_or_path, torch_dtype=torch.float16, trust_remote_code=True).to(device)
+            model = AutoModelForCausalLM.from_pretrained(model_name_or_path, torch_dtype=torch_dtype, trust_remote_code=True).to(device)
     return {'model': model.to(device), 'processor': processor}
 
 
@@ -88,6 +90,15 @@ def get_parsed_content_icon(filtered_boxes, starting_idx, image_source, caption_
         except:
             continue
 
+    # Optional cross-request batcher supplied by the caller (see Mei's VisualAnalyzer)
+    batcher = caption_model_processor.get('batcher')
+    if batcher is not None and not prompt:
+        return batcher(croped_pil_image)
+    return caption_cropped_images(croped_pil_image, caption_model_processor, prompt=prompt, batch_size=batch_size)
+
+
+@torch.inference_mode()
+def caption_cropped_images(croped_pil_image, caption_model_processor, prompt=None, batch_size=128):
     model, processor = caption_model_processor['model'], caption_model_processor['processor']
     if not prompt:
         if 'florence' in model.config.name_or_path:
@@ -102,7 +113,13 @@ def get_parsed_content_icon(filtered_boxes, starting_idx, image_source, caption_
         batch = croped_pil_image[i:i+batch_size]
         t1 = time.time()
         if model.device.type == 'cuda':
-            inputs = processor(images=batch, text=[prompt]*len(batch), return_tensors="pt", do_resize=False).to(device=device, dtype=torch.float16)
+            inputs = processor(images=batch, text=[prompt]*len(batch), return_tensors="pt", do_resize=False)
+            # Page-locked staging lets the host->device copies run asynchronously;
+            # floating inputs are cast to the model dtype like BatchFeature.to()
+            inputs = {
+                k: v.pin_memory().to(device=device, dtype=model.dtype if v.is_floating_point() else None, non_blocking=True)
+                for k, v in inputs.items()
+            }
         else:
             inputs = processor(images=batch, text=[prompt]*len(batch), return_tensors="pt").to(device=device)
         if 'florence' in model.config.name_or_path:
@@ -299,7 +316,7 @@ def remove_overlap_new(boxes, iou_threshold, ocr_bbox=None):
                     else:
                         filtered_boxes.append({'type': 'icon', 'bbox': box1_elem['bbox'], 'interactivity': True, 'content': None, 'source':'box_yolo_content_yolo'})
             else:
-                filtered_boxes.append(box1)
+                filtered_boxes.append({'type': 'icon', 'bbox': box1_elem['bbox'], 'interactivity': True, 'content': None, 'source':'box_yolo_content_yolo'})
     return filtered_boxes # torch.tensor(filtered_boxes)
 
 
@@ -392,27 +409,53 @@ def predict_yolo(model, image, box_threshold, imgsz, scale_img, iou_threshold=0.
 
     return boxes, conf, phrases
 
+def predict_yolo_batch(model, images, box_threshold, iou_threshold=0.7, rect=True):
+    """ Run predict_yolo over several images in a single model call
+
+    rect=False letterboxes every image to the full square imgsz, so the
+    network always sees one input shape whatever the aspect ratio
+    """
+    results = model.predict(
+    source=list(images),
+    conf=box_threshold,
+    iou=iou_threshold,
+    rect=rect,
+    )
+    batch = []
+    for result in results:
+        boxes = result.boxes.xyxy
+        batch.append((boxes, result.boxes.conf, [str(i) for i in range(len(boxes))]))
+    return batch
+
 def int_box_area(box, w, h):
     x1, y1, x2, y2 = box
     int_box = [int(x1*w), int(y1*h), int(x2*w), int(y2*h)]
     area = (int_box[2] - int_box[0]) * (int_box[3] - int_box[1])
     return area
 
-def get_som_labeled_img(image_source: Union[str, Image.Image], model=None, BOX_TRESHOLD=0.01, output_coord_in_ratio=False, ocr_bbox=None, text_scale=0.4, text_padding=5, draw_bbox_config=None, caption_model_processor=None, ocr_text=[], use_local_semantics=True, iou_threshold=0.9,prompt=None, scale_img=False, imgsz=None, batch_size=128):
+def get_som_labeled_img(image_source: Union[str, Image.Image], model=None, BOX_TRESHOLD=0.01, output_coord_in_ratio=False, ocr_bbox=None, text_scale=0.4, text_padding=5, draw_bbox_config=None, caption_model_processor=None, ocr_text=[], use_local_semantics=True, iou_threshold=0.9,prompt=None, scale_img=False, imgsz=None, batch_size=128, image_format='PNG', image_quality=90, yolo_result=None):
     """Process either an image path or Image object
     
     Args:
         image_source: Either a file path (str) or PIL Image object
+        image_format: Codec for the base64 annotated image ('PNG', 'JPEG' or 'WEBP'),
+            or None to return the annotated PIL image without encoding it
+        image_quality: Quality used by the lossy codecs
+        yolo_result: Optional precomputed (xyxy, logits, phrases) from predict_yolo,
+            lets the caller run detection concurrently with OCR
         ...
     """
     if isinstance(image_source, str):
         image_source = Image.open(image_source)
-    image_source = image_source.convert("RGB") # for CLIP
+    if image_source.mode != "RGB":
+        image_source = image_source.convert("RGB") # for CLIP
     w, h = image_source.size
     if not imgsz:
         imgsz = (h, w)
     # print('image size:', w, h)
-    xyxy, logits, phrases = predict_yolo(model=model, image=image_source, box_threshold=BOX_TRESHOLD, imgsz=imgsz, scale_img=scale_img, iou_threshold=0.1)
+    if yolo_result is None:
+        yolo_result = predict_yolo(model=model, image=image_source, box_threshold=BOX_TRESHOLD, imgsz=imgsz, scale_img=scale_img, iou_threshold=0.1)
+    xyxy, logits, phrases = yolo_result
     xyxy = xyxy / torch.Tensor([w, h, w, h]).to(xyxy.device)
     image_source = np.asarray(image_source)
     phrases = [str(i) for i in range(len(phrases))]
@@ -425,7 +468,7 @@ def get_som_labeled_img(image_source: Union[str, Image.Image], model=None, BOX_T
         print('no ocr bbox!!!')
         ocr_bbox = None
 
-    ocr_bbox_elem = [{'type': 'text', 'bbox':box, 'interactivity':False, 'content':txt, 'source': 'box_ocr_content_ocr'} for box, txt in zip(ocr_bbox, ocr_text) if int_box_area(box, w, h) > 0] 
+    ocr_bbox_elem = [{'type': 'text', 'bbox':box, 'interactivity':False, 'content':txt, 'source': 'box_ocr_content_ocr'} for box, txt in zip(ocr_bbox or [], ocr_text) if int_box_area(box, w, h) > 0] 
     xyxy_elem = [{'type': 'icon', 'bbox':box, 'interactivity':True, 'content':None} for box in xyxy.tolist() if int_box_area(box, w, h) > 0]
     filtered_boxes = remove_overlap_new(boxes=xyxy_elem, iou_threshold=iou_threshold, ocr_bbox=ocr_bbox_elem)
     
@@ -469,10 +512,24 @@ def get_som_labeled_img(image_source: Union[str, Image.Image], model=None, BOX_T
     else:
         annotated_frame, label_coordinates = annotate(image_source=image_source, boxes=filtered_boxes, logits=logits, phrases=phrases, text_scale=text_scale, text_padding=text_padding)
     
-    pil_img = Image.fromarray(annotated_frame)
-    buffered = io.BytesIO()
-    pil_img.save(buffered, format="PNG")
-    encoded_image = base64.b64encode(buffered.getvalue()).decode('ascii')
+    if image_format is None:
+        # In-process callers take the image as-is; no codec, no base64
+        encoded_image = Image.fromarray(annotated_frame)
+    else:
+        # cv2 encodes straight from the array and releases the GIL while it does
+        image_format = image_format.upper()
+        if image_format in ('JPEG', 'JPG'):
+            ext, params = '.jpg', [cv2.IMWRITE_JPEG_QUALITY, image_quality]
+        elif image_format == 'WEBP':
+            ext, params = '.webp', [cv2.IMWRITE_WEBP_QUALITY, image_quality]
+        else:
+            # Lossless either way; level 1 encodes several times faster than the default
+            ext, params = '.png', [cv2.IMWRITE_PNG_COMPRESSION, 1]
+        ok, buffer = cv2.imencode(ext, cv2.cvtColor(annotated_frame, cv2.COLOR_RGB2BGR), params)
+        if not ok:
+            raise ValueError(f"Failed to encode annotated image as {image_format}")
+        # buffer is a uint8 array; b64encode reads it without a bytes copy
+        encoded_image = base64.b64encode(buffer).decode('ascii')
     if output_coord_in_ratio:
         label_coordinates = {k: [v[0]/w, v[1]/h, v[2]/w, v[3]/h] for k, v in label_coordinates.items()}
         assert w == annotated_frame.shape[1] and h == annotated_frame.shape[0]
@@ -495,14 +552,19 @@ def get_xywh_yolo(input):
     x, y, w, h = int(x), int(y), int(w), int(h)
     return x, y, w, h
 
-def check_ocr_box(image_source: Union[str, Image.Image], display_img = True, output_bb_format='xywh', goal_filtering=None, easyocr_args=None, use_paddleocr=False):
-    if isinstance(image_source, str):
-        image_source = Image.open(image_source)
-    if image_source.mode == 'RGBA':
-        # Convert RGBA to RGB to avoid alpha channel issues
-        image_source = image_source.convert('RGB')
-    image_np = np.array(image_source)
-    w, h = image_source.size
+def check_ocr_box(image_source: Union[str, Image.Image, np.ndarray], display_img = True, output_bb_format='xywh', goal_filtering=None, easyocr_args=None, use_paddleocr=False):
+    if isinstance(image_source, np.ndarray):
+        # Decoded RGB frames go straight to the OCR engine
+        image_np = image_source
+    else:
+        if isinstance(image_source, str):
+            image_source = Image.open(image_source)
+        if image_source.mode == 'RGBA':
+            # Convert RGBA to RGB to avoid alpha channel issues
+            image_source = image_source.convert('RGB')
+        # Read-only view; EasyOCR and PaddleOCR do not write into the input
+        image_np = np.asarray(image_source)
+    h, w = image_np.shape[:2]
     if use_paddleocr:
         if easyocr_args is None:
             text_threshold = 0.5
@@ -10,6 +10,8 @@ if OMNIPARSER_DIR not in sys.path:
     sys.path.insert(0,OMNIPARSER_DIR)
 
 os.environ['DISABLE_MODEL_SOURCE_CHECK'] = "True"
+# Load CUDA kernels on first use instead of all at context creation
+os.environ.setdefault('CUDA_MODULE_LOADING', 'LAZY')
 
 import types
 
@@ -29,40 +31,173 @@ if "flash_attn" not in sys.modules:
 
 
 
+import hashlib
+import importlib.util
+from bisect import bisect_right
 import threading
 import time
-import tempfile
+import queue
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import replace
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import torch
 from PIL import Image
 import numpy as np
 
+if torch.cuda.is_available():
+    # TF32 matmuls and cuDNN autotuning; yolo_static_shape keeps the YOLO input shape fixed
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+    torch.backends.cudnn.benchmark = True
+    torch.set_float32_matmul_precision('high')
+
 from typing import List, Optional, Tuple, Dict, Any
 
 from ...core.config import get_config,Screenshot, VisualElement, VisualAnalysisResult
-from ...core.events import emit, subscribe, EventType
+from ...core.events import emit, subscribe, has_subscribers, EventType
+from .image_hash import screenshot_dhash
 
 try:
-    from .OmniParser.util.utils import get_yolo_model, get_caption_model_processor, get_som_labeled_img,check_ocr_box
+    from .OmniParser.util.utils import get_yolo_model, get_caption_model_processor, get_som_labeled_img,check_ocr_box, caption_cropped_images, predict_yolo_batch
+    import cv2
     OMNIPARSER_AVAILABLE = True
 except ImportError as e:
     print(f"Omniparser Import failed")
     OMNIPARSER_AVAILABLE = False
 
+class CaptionBatcher:
+    """
+    Coalesces icon-caption requests from concurrent analyze() calls into
+    shared model batches. Each caller blocks on its own Future while a
+    single worker thread owns the caption model.
+    """
+    def __init__(self, caption_model_processor:Dict[str,Any], batch_size:int = 128, window_ms:float = 5.0):
+        self._caption_model_processor = caption_model_processor
+        self._batch_size = batch_size
+        self._window = window_ms/1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="CaptionBatcher", daemon=True)
+        self._worker.start()
+
+    def __call__(self, crops:List[Image.Image])->List[str]:
+        if not crops:
+            return []
+        future: Future = Future()
+        self._queue.put((crops, future))
+        return future.result()
+
+    def stop(self)->None:
+        self._queue.put(None)
+        self._worker.join(timeout=2.0)
+
+    def _run(self)->None:
+        running = True
+        while running:
+            request = self._queue.get()
+            if request is None:
+                break
+            pending = [request]
+            total = len(request[0])
+
+            # Wait a short window for other callers so their crops share the batch
+            deadline = time.monotonic() + self._window
+            while total < self._batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    running = False
+                    break
+                pending.append(request)
+                total += len(request[0])
+
+            crops = [crop for request_crops, _ in pending for crop in request_crops]
+            try:
+                texts = caption_cropped_images(crops, self._caption_model_processor, batch_size=self._batch_size)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for request_crops, future in pending:
+                future.set_result(texts[start:start+len(request_crops)])
+                start += len(request_crops)
+
+        # Fail anything that arrived after stop() so callers don't block forever
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request[1].set_exception(RuntimeError("Caption batcher stopped"))
+
 class VisualAnalyzer:
+    # OmniParser box source -> estimated confidence (anything else: 0.6)
+    _CONFIDENCE_BY_SOURCE = {
+        'box_ocr_content_ocr': 0.9,
+        'box_yolo_content_ocr': 0.85,
+        'box_yolo_content_yolo': 0.75
+    }
+    _CLICKABLE_TYPES = ('button', 'icon', 'hyperlink')
+
     def __init__(self):
         if not OMNIPARSER_AVAILABLE:
             raise ImportError("OmniParser not available")
         self.config = get_config().visual
+        # Snapshot of the settings read on every analysis
+        self._box_threshold = self.config.box_threshold
+        self._conf_threshold = self.config.detection_confidence_threshold
+        self._max_elements = self.config.max_elements_per_analysis
+        self._use_local_semantics = self.config.use_local_semantics
+        self._annotated_image_format = self.config.annotated_image_format
+        self._annotated_image_quality = self.config.annotated_image_quality
+        self._max_analysis_dimension = self.config.max_analysis_dimension
+        self._yolo_precision = self.config.yolo_precision
+        self._yolo_tensorrt = self.config.yolo_tensorrt
+        self._yolo_static_shape = self.config.yolo_static_shape
+        self._caption_quantization = self.config.caption_quantization
+        self._compile_models = self.config.compile_models
+        self._compile_backend = self.config.compile_backend
+        self._ocr_mode = self.config.ocr_mode
+        self._ocr_auto_min_text_regions = self.config.ocr_auto_min_text_regions
+        self._caption_batch_window_ms = self.config.caption_batch_window_ms
+        self._analysis_batch_size = max(self.config.analysis_batch_size, 1)
+        self._perceptual_cache_distance = self.config.perceptual_cache_distance
         self._yolo_model = None
         self._caption_model_processor = None
+        self._caption_batcher: Optional[CaptionBatcher] = None
+        self._ocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="VisualOCR")
+        # Labels the frames of one analyze_batch() chunk concurrently
+        self._label_executor = ThreadPoolExecutor(max_workers=self._analysis_batch_size, thread_name_prefix="VisualLabel")
+        # Converts/resizes the next analyze_batch() chunk while the current one is on the GPU
+        self._prep_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="VisualPrep")
+        # A single worker so subscribers still see events in emission order
+        self._event_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="VisualEvents")
         self._models_loaded = False
 
         self._load_lock = threading.Lock()
+
+        # Recent analyze() results, so chained find_* queries on the same
+        # screenshot reuse one OmniParser pass
+        self._result_cache: "OrderedDict[tuple, VisualAnalysisResult]" = OrderedDict()
+        self._result_cache_size = 4
+        # id(screenshot) -> (screenshot, pixel digest); holding the screenshot keeps the id valid
+        self._fingerprints: "OrderedDict[int, Tuple[Screenshot, bytes]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._spatial_cell_size = 64
         
         weights_dir = os.path.join(OMNIPARSER_DIR, "weights")
         self._icon_detect_path = os.path.join(weights_dir, "icon_detect","model.pt")
         self._icon_caption_path = os.path.join(weights_dir,"icon_caption")
+        self._compile_cache_dir = os.path.join(weights_dir, "compile_cache")
 
         if not os.path.exists(self._icon_caption_path):
             raise FileNotFoundError(f"Caption model not found")
@@ -70,6 +205,7 @@ class VisualAnalyzer:
             raise FileNotFoundError(f"Detection model not found")
 
         self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._torch_dtype = self._caption_dtype()
         self._type_map = {
             'icon': 'icon',
             'text': 'text',
@@ -83,7 +219,7 @@ class VisualAnalyzer:
         }
         print(f"VisualAnalyzer Initialized. Device: {self._device}")
 
-    def _load_models(self)->bool:
+    def _load_models(self, warm_up:bool = False)->bool:
         if self._models_loaded:
             return True
         with self._load_lock:
@@ -92,9 +228,26 @@ class VisualAnalyzer:
             try:
                 emit(event_type=EventType.VISUAL_ANALYSIS_STARTED, source="VisualAnalyzer", operation= "loading_models")
                 print("Loading Yolo Model")
-                self._yolo_model = get_yolo_model(self._icon_detect_path)
-                print("Loading caption model")
-                self._caption_model_processor = get_caption_model_processor(model_name = "florence2", model_name_or_path=self._icon_caption_path,device=self._device)
+                self._yolo_model = self._load_yolo_model()
+                # Florence-2 only captions icons; without local semantics it is never loaded
+                if self._use_local_semantics:
+                    print("Loading caption model")
+                    self._caption_model_processor = get_caption_model_processor(model_name = "florence2", model_name_or_path=self._icon_caption_path,device=self._device,
+                                                                                torch_dtype=self._torch_dtype)
+                    self._quantize_caption_model(self._caption_model_processor['model'])
+                    if self._caption_batch_window_ms > 0:
+                        self._caption_batcher = CaptionBatcher(
+                            dict(self._caption_model_processor),
+                            batch_size=128,
+                            window_ms=self._caption_batch_window_ms
+                        )
+                        self._caption_model_processor['batcher'] = self._caption_batcher
+                if self._compile_models and self._device == "cuda":
+                    self._compile_and_warm_up()
+                elif warm_up:
+                    # Still under _load_lock: an analyze() arriving now waits
+                    # instead of sharing the YOLO predictor and EasyOCR reader
+                    self._warm_up()
                 self._models_loaded = True
 
                 emit(event_type=EventType.OMNIPARSER_LOADED, source="VisualAnalyzer", device = self._device)
@@ -106,80 +259,443 @@ class VisualAnalyzer:
                 emit(event_type=EventType.OMNIPARSER_ERROR, source="VisualAnalyzer", error = str(e),operation= "load_models")
                 return False
             
+    def _warm_up(self)->None:
+        # The first CUDA calls select cuDNN/cuBLAS kernels and EasyOCR sets
+        # itself up; a blank frame pays for that while nobody is waiting
+        side = self._max_analysis_dimension
+        dummy_screen = Image.new('RGB', (side, side*9//16))
+        try:
+            with self._inference_context():
+                predict_yolo_batch(model=self._yolo_model, images=[dummy_screen], box_threshold=self._box_threshold,
+                                   rect=not self._yolo_static_shape)
+                if self._caption_model_processor is not None:
+                    caption_cropped_images([Image.new('RGB', (64, 64))], self._caption_model_processor)
+            check_ocr_box(np.asarray(dummy_screen), display_img=False, output_bb_format='xyxy', use_paddleocr=False)
+        except Exception as e:
+            print(f"[VisualAnalyzer] Warmup failed: {e}")
+
+    def _compile_and_warm_up(self)->None:
+        # Compilation happens on the first call per shape, so dummy inputs pay
+        # for it here instead of the first real analysis
+        self._load_compile_cache()
+        side = self._max_analysis_dimension
+        dummy_screen = Image.new('RGB', (side, side*9//16))
+        dummy_crop = Image.new('RGB', (64, 64))
+        try:
+            with self._inference_context():
+                # The predictor (and its fused backend module) exists only after a first call
+                predict_yolo_batch(model=self._yolo_model, images=[dummy_screen], box_threshold=self._box_threshold,
+                                   rect=not self._yolo_static_shape)
+                backend = self._yolo_model.predictor.model
+                if isinstance(getattr(backend, 'model', None), torch.nn.Module):
+                    backend.model = torch.compile(backend.model, mode="reduce-overhead", fullgraph=False)
+                    predict_yolo_batch(model=self._yolo_model, images=[dummy_screen], box_threshold=self._box_threshold,
+                                       rect=not self._yolo_static_shape)
+
+        except Exception as e:
+            # Eager models still work; compilation is only an optimization
+            print(f"[VisualAnalyzer] YOLO torch.compile warmup failed, running eager: {e}")
+
+        if self._caption_model_processor is not None:
+            caption_model = self._caption_model_processor['model']
+            eager_forward = caption_model.forward
+            try:
+                with self._inference_context():
+                    caption_model.forward = self._compile_caption_forward(eager_forward)
+                    caption_cropped_images([dummy_crop], self._caption_model_processor)
+            except Exception as e:
+                caption_model.forward = eager_forward
+                print(f"[VisualAnalyzer] Caption torch.compile warmup failed, running eager: {e}")
+        self._save_compile_cache()
+
+    def _load_compile_cache(self)->None:
+        # Inductor's on-disk cache lives next to the weights so restarts reuse
+        # compiled kernels; the artifact bundle also restores autotuning results
+        os.makedirs(self._compile_cache_dir, exist_ok=True)
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", self._compile_cache_dir)
+        artifacts_path = os.path.join(self._compile_cache_dir, "artifacts.bin")
+        if not os.path.exists(artifacts_path) or not hasattr(torch.compiler, "load_cache_artifacts"):
+            return
+        try:
+            with open(artifacts_path, "rb") as f:
+                torch.compiler.load_cache_artifacts(f.read())
+        except Exception as e:
+            print(f"[VisualAnalyzer] Ignoring unusable compile cache: {e}")
+
+    def _save_compile_cache(self)->None:
+        if not hasattr(torch.compiler, "save_cache_artifacts"):
+            return
+        try:
+            artifacts = torch.compiler.save_cache_artifacts()
+            if artifacts is not None:
+                with open(os.path.join(self._compile_cache_dir, "artifacts.bin"), "wb") as f:
+                    f.write(artifacts[0])
+        except Exception as e:
+            print(f"[VisualAnalyzer] Could not save compile cache: {e}")
+
+    def _compile_caption_forward(self, forward):
+        if self._compile_backend == "tensorrt":
+            try:
+                # Engines are built per input shape on first call, in the model's precision.
+                # Imported only to register the "tensorrt" torch.compile backend
+                import torch_tensorrt  # noqa: F401
+                return torch.compile(forward, backend="tensorrt", dynamic=False,
+                                     options={"enabled_precisions": {self._torch_dtype}})
+            except ImportError:
+                print("[VisualAnalyzer] torch_tensorrt not installed, compiling Florence-2 with inductor")
+        return torch.compile(forward, mode="reduce-overhead", fullgraph=False)
+
+    def _quantize_caption_model(self, model:torch.nn.Module)->None:
+        mode = self._caption_quantization
+        if mode == "int8" and self._device == "cpu":
+            # Dynamic int8 only has CPU kernels; Linear layers dominate Florence-2
+            torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            return
+        if mode not in ("int4", "fp8") or self._device != "cuda":
+            return
+        if mode == "fp8" and torch.cuda.get_device_capability() < (9, 0):
+            # Pre-Hopper GPUs upcast fp8 activations, so there is no speedup to gain
+            print("[VisualAnalyzer] FP8 captions need SM90+, keeping the caption model in 16-bit")
+            return
+        try:
+            from torchao.quantization import quantize_, int4_weight_only, float8_weight_only
+        except ImportError:
+            print(f"[VisualAnalyzer] torchao not installed, skipping {mode} caption quantization")
+            return
+        quantize_(model, int4_weight_only() if mode == "int4" else float8_weight_only())
+
+    def _caption_dtype(self)->torch.dtype:
+        mode = self._caption_quantization
+        if self._device != "cuda" or mode == "none":
+            return torch.float32
+        # torchao's int4 kernels and fp8 weight-only run with bf16 activations
+        if mode in ("bf16", "int4", "fp8") and torch.cuda.is_bf16_supported():
+            return torch.bfloat16
+        return torch.float16
+
+    def _load_yolo_model(self):
+        precision = self._yolo_precision
+        if self._device != "cuda" or precision not in ("fp16", "int8") or not self._yolo_tensorrt:
+            return get_yolo_model(self._icon_detect_path)
+        # Ultralytics would pip-install tensorrt mid-export if it were missing
+        if importlib.util.find_spec("tensorrt") is None:
+            print("[VisualAnalyzer] tensorrt not installed, using PyTorch weights")
+            return get_yolo_model(self._icon_detect_path)
+
+        # TensorRT engine is built once and cached next to model.pt. It is
+        # exported with a dynamic batch so analyze_batch() can share one call
+        batch = self._analysis_batch_size
+        engine_path = os.path.join(os.path.dirname(self._icon_detect_path), f"model_{precision}_b{batch}.engine")
+        if not os.path.exists(engine_path):
+            # The export goes through model.onnx beside the weights
+            onnx_path = os.path.splitext(self._icon_detect_path)[0] + ".onnx"
+            keep_onnx = os.path.exists(onnx_path)
+            try:
+                print(f"Exporting YOLO TensorRT engine ({precision}), first run only")
+                exported = get_yolo_model(self._icon_detect_path).export(
+                    format="engine",
+                    half=(precision == "fp16"),
+                    int8=(precision == "int8"),
+                    dynamic=True,
+                    batch=batch,
+                    device=0
+                )
+                os.replace(exported, engine_path)
+            except Exception as e:
+                print(f"[VisualAnalyzer] TensorRT export failed, using PyTorch weights: {e}")
+                return get_yolo_model(self._icon_detect_path)
+            finally:
+                if not keep_onnx and os.path.exists(onnx_path):
+                    os.remove(onnx_path)
+        return get_yolo_model(engine_path)
+
     def analyze(self, screenshot:Screenshot, detect_element:bool = True,
                 extract_text:bool = True)->VisualAnalysisResult:
+        return self.analyze_batch([screenshot], detect_element=detect_element, extract_text=extract_text)[0]
+
+    def analyze_batch(self, screenshots:List[Screenshot], detect_element:bool = True,
+                      extract_text:bool = True)->List[VisualAnalysisResult]:
+        """
+        Analyze several screenshots, running YOLO over them in shared
+        batches of up to analysis_batch_size. Results are in input order.
+        """
+        results: List[Optional[VisualAnalysisResult]] = [None]*len(screenshots)
+        pending = []
+        for i, screenshot in enumerate(screenshots):
+            cache_key, cached = self._lookup_cached(screenshot, detect_element, extract_text)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, screenshot, cache_key))
+
+        step = self._analysis_batch_size
+        chunks = [pending[chunk_start:chunk_start+step] for chunk_start in range(0, len(pending), step)]
+        prepared = None
+        for n, chunk in enumerate(chunks):
+            # Chunk N+1 is prepared on the CPU while chunk N runs detection
+            next_prepared = (self._prep_executor.submit(self._prepare_chunk, chunks[n+1])
+                             if n+1 < len(chunks) else None)
+            for (i, _, _), result in zip(chunk, self._analyze_chunk(chunk, detect_element, extract_text, prepared)):
+                results[i] = result
+            prepared = next_prepared.result() if next_prepared is not None else None
+        return results
+
+    def _prepare_chunk(self, chunk:List[Tuple[int,Screenshot,tuple]])->List[Tuple[Image.Image,Tuple[int,int]]]:
+        return [self._prepare_image(screenshot.image) for _, screenshot, _ in chunk]
+
+    def _analyze_chunk(self, chunk:List[Tuple[int,Screenshot,tuple]], detect_element:bool,
+                       extract_text:bool,
+                       prepared:Optional[List[Tuple[Image.Image,Tuple[int,int]]]] = None)->List[VisualAnalysisResult]:
         start_time = time.time()
-        
-        emit(event_type=EventType.VISUAL_ANALYSIS_STARTED, source="VisualAnalysis", detect_element=detect_element,extract_text=extract_text)
-        
-        elements:List[VisualElement] = []
-        text_content: str = ""
-        annotated_image: Optional[Image.Image] = None
-        model_used: str = "none"
-        
-        image = screenshot.image
-        
-        if not isinstance(image,Image.Image):
-            image = Image.fromarray(image)
-        
+
+        for _ in chunk:
+            self._emit_async(event_type=EventType.VISUAL_ANALYSIS_STARTED, source="VisualAnalysis", detect_element=detect_element,extract_text=extract_text)
+
+        # Boxes come back as ratios, so they are mapped onto the original size
+        if prepared is None:
+            prepared = self._prepare_chunk(chunk)
+        images = [image for image, _ in prepared]
+
+        detections = [([], "", None, False) for _ in chunk]
         if detect_element:
             try:
-                elements,text_content,annotated_image =\
-                                                        self._detect_elements(image,screenshot)
-                model_used = "omniparser" if elements else "none"
+                detections = self._detect_elements(images,[screenshot for _, screenshot, _ in chunk],
+                                                   run_ocr=extract_text or self._use_local_semantics,
+                                                   original_sizes=[size for _, size in prepared])
             except Exception as e:
-                emit(EventType.ERROR, source="VisualAnalyzer", error = str(e), operation= "detect_elements")
+                self._emit_async(EventType.ERROR, source="VisualAnalyzer", error = str(e), operation= "detect_elements")
 
-        if extract_text and not text_content:
-            try:
-                text_content = self._extract_text_only(image)
-                if model_used == "none":
-                    model_used = 'ocr_only'
-            except Exception as e:
-                emit(event_type=EventType.ERROR, source="VisualAnalyzer", error=str(e), operation="extract_text")
-            
-        elapsed_ms = (time.time()-start_time)*1000
-
-        result = VisualAnalysisResult(
-            screenshot=screenshot,
-            elements=elements,
-            text_content=text_content,
-            analysis_time_ms=elapsed_ms,
-            model_used=model_used,
-            confidence_threshold=self.config.detection_confidence_threshold,
-            annotated_image=annotated_image)
-            
-        emit(event_type=EventType.VISUAL_ANALYSIS_COMPLETED,
-                source="VisualAnalyzer",
-                data = result,
-                elements_found = len(elements),
-                text_length = len(text_content),
-                time_ms = elapsed_ms)
+        results = []
+        for (_, screenshot, cache_key), image, detection in zip(chunk, images, detections):
+            elements,text_content,annotated_image,ocr_ran = detection
+            model_used = "omniparser" if elements else "none"
+
+            # Detection already ran OCR on this frame; an empty result there
+            # would come back empty again
+            if extract_text and not text_content and not ocr_ran:
+                try:
+                    text_content = self._extract_text_only(image)
+                    if model_used == "none":
+                        model_used = 'ocr_only'
+                except Exception as e:
+                    self._emit_async(event_type=EventType.ERROR, source="VisualAnalyzer", error=str(e), operation="extract_text")
+
+            elapsed_ms = (time.time()-start_time)*1000
+
+            result = VisualAnalysisResult(
+                screenshot=screenshot,
+                elements=elements,
+                text_content=text_content,
+                analysis_time_ms=elapsed_ms,
+                model_used=model_used,
+                confidence_threshold=self._conf_threshold,
+                annotated_image=annotated_image)
+
+            self._emit_async(event_type=EventType.VISUAL_ANALYSIS_COMPLETED,
+                    source="VisualAnalyzer",
+                    data = result,
+                    elements_found = len(elements),
+                    text_length = len(text_content),
+                    time_ms = elapsed_ms)
+            if elements or text_content:
+                self._store_cached_result(cache_key, result)
+            results.append(result)
+        return results
+
+    def _fingerprint(self, screenshot:Screenshot)->bytes:
+        # Keyed on pixels, so a re-captured but unchanged screen also hits the cache
+        with self._cache_lock:
+            entry = self._fingerprints.get(id(screenshot))
+            if entry is not None and entry[0] is screenshot:
+                self._fingerprints.move_to_end(id(screenshot))
+                return entry[1]
+
+        image = screenshot.image
+        if isinstance(image, np.ndarray):
+            data = memoryview(np.ascontiguousarray(image))
+        else:
+            data = image.tobytes()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+
+        with self._cache_lock:
+            self._fingerprints[id(screenshot)] = (screenshot, digest)
+            while len(self._fingerprints) > self._result_cache_size:
+                self._fingerprints.popitem(last=False)
+        return digest
+
+    def _emit_async(self, event_type:EventType, source:str = "VisualAnalyzer", **data)->None:
+        # Subscribers (logging, UI) run on the event worker instead of
+        # holding up the next detection on the analysis thread. With nobody
+        # listening the event is only recorded in the bus history, which is
+        # cheaper inline than a hand-off to the worker.
+        if not has_subscribers(event_type):
+            emit(event_type, source, **data)
+            return
+        self._event_executor.submit(emit, event_type, source, **data)
+
+    def _lookup_cached(self, screenshot:Screenshot, detect_element:bool,
+                       extract_text:bool)->Tuple[tuple, Optional[VisualAnalysisResult]]:
+        # Equal pixels at another position or size give elements with
+        # different screen coordinates, so those belong to the key too
+        cache_key = (self._fingerprint(screenshot), screenshot.region,
+                     self._image_size(screenshot.image), detect_element, extract_text)
+        cached = self._get_cached_result(cache_key, screenshot)
+        if cached is None and self._perceptual_cache_distance >= 0:
+            cached = self._get_similar_result(screenshot, detect_element, extract_text)
+        return cache_key, cached
+
+    def _get_cached_result(self, cache_key:tuple, screenshot:Screenshot)->Optional[VisualAnalysisResult]:
+        with self._cache_lock:
+            result = self._result_cache.get(cache_key)
+            if result is None:
+                return None
+            self._result_cache.move_to_end(cache_key)
+        if result.screenshot is not screenshot:
+            # Same pixels from a newer capture
+            result = replace(result, screenshot=screenshot)
         return result
+
+    def _get_similar_result(self, screenshot:Screenshot, detect_element:bool,
+                            extract_text:bool)->Optional[VisualAnalysisResult]:
+        # Near-duplicate frames (mouse moves, cursor blinks) reuse the newest
+        # cached result whose dhash is within the configured Hamming distance
+        dhash = screenshot_dhash(screenshot)
+        size = self._image_size(screenshot.image)
+        flags = (detect_element, extract_text)
+        with self._cache_lock:
+            for cache_key, result in reversed(self._result_cache.items()):
+                other = result.screenshot
+                if (cache_key[-2:] != flags or other.dhash is None or other.region != screenshot.region
+                        or self._image_size(other.image) != size):
+                    continue
+                if bin(dhash ^ other.dhash).count('1') <= self._perceptual_cache_distance:
+                    self._result_cache.move_to_end(cache_key)
+                    break
+            else:
+                return None
+        return replace(result, screenshot=screenshot)
+
+    @staticmethod
+    def _image_size(image:Any)->Tuple[int,int]:
+        if isinstance(image, np.ndarray):
+            return image.shape[1], image.shape[0]
+        return image.size
+
+    def _store_cached_result(self, cache_key:tuple, result:VisualAnalysisResult)->None:
+        with self._cache_lock:
+            self._result_cache[cache_key] = result
+            self._result_cache.move_to_end(cache_key)
+            while len(self._result_cache) > self._result_cache_size:
+                self._result_cache.popitem(last=False)
+
+    def clear_cache(self)->None:
+        with self._cache_lock:
+            self._result_cache.clear()
+            self._fingerprints.clear()
         
-    def _detect_elements(self, image:Image.Image, screenshot:Screenshot)->Tuple[List[VisualElement],str,Optional[Image.Image]]:
+    def _prepare_image(self, image:Any)->Tuple[Image.Image,Tuple[int,int]]:
+        # Returns the RGB frame handed to OCR/detection and the original size.
+        # Converted once here; detection and OCR both receive the same frame.
+        if isinstance(image,np.ndarray):
+            # Raw arrays stay in NumPy/cv2 until the single PIL wrap at the end
+            arr = image
+            if arr.ndim == 2:
+                arr = cv2.cvtColor(arr, cv2.COLOR_GRAY2RGB)
+            elif arr.shape[2] == 4:
+                arr = cv2.cvtColor(arr, cv2.COLOR_RGBA2RGB)
+            original_size = (arr.shape[1], arr.shape[0])
+            return Image.fromarray(self._downscale_array(arr)), original_size
+
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        original_size = image.size
+        new_size = self._analysis_size(*original_size)
+        if new_size == original_size:
+            return image, original_size
+        # Resized in PIL directly: reducing_gap box-reduces first, then a
+        # bilinear pass, without copying the frame out to NumPy and back
+        return image.resize(new_size, Image.BILINEAR, reducing_gap=2.0), original_size
+
+    def _analysis_size(self, width:int, height:int)->Tuple[int,int]:
+        # OCR and YOLO cost scale with pixel count; large screens are shrunk first
+        longest = max(width, height)
+        if longest <= self._max_analysis_dimension:
+            return width, height
+        scale = self._max_analysis_dimension / longest
+        return max(int(width*scale),1), max(int(height*scale),1)
+
+    def _downscale_array(self, arr:np.ndarray)->np.ndarray:
+        height, width = arr.shape[:2]
+        new_size = self._analysis_size(width, height)
+        if new_size == (width, height):
+            return arr
+        return cv2.resize(arr, new_size, interpolation=cv2.INTER_AREA)
+
+    def _detect_elements(self, images:List[Image.Image], screenshots:List[Screenshot], run_ocr:bool = True,
+                         original_sizes:Optional[List[Tuple[int,int]]] = None
+                         )->List[Tuple[List[VisualElement],str,Optional[Image.Image],bool]]:
         if not self._load_models():
-            return [],"", None
+            return [([],"", None, False) for _ in images]
 
-        temp_file= tempfile.NamedTemporaryFile(suffix='.png',delete=False)
-        temp_path = temp_file.name
-        temp_file.close()
-        if image.mode!='RGB':
-            image = image.convert("RGB")
-        image.save(temp_path)
+        # OmniParser accepts PIL images directly, so hand the frames over in
+        # memory instead of encoding them to PNG files and decoding them again.
+        # OCR is the most expensive step; skip it when neither the caller
+        # nor the caption pass needs text.
+        ocr_futures = [None]*len(images)
+        # Frames whose OCR was deliberately skipped count as having no text
+        ocr_skipped = [False]*len(images)
+        if run_ocr:
+            for index, image in enumerate(images):
+                if self._ocr_mode == "never" or (self._ocr_mode == "auto" and
+                        self._count_text_regions(image) < self._ocr_auto_min_text_regions):
+                    ocr_skipped[index] = True
+                    continue
+                # EasyOCR and YOLO are independent and both release the GIL in
+                # torch, so OCR runs on the worker while YOLO runs here
+                ocr_futures[index] = self._ocr_executor.submit(
+                    check_ocr_box,
+                    image,
+                    display_img=False,
+                    output_bb_format='xyxy',
+                    easyocr_args={'text_threshold':0.8},
+                    use_paddleocr=False
+                )
 
-        try:
-            (ocr_text_list, ocr_bbox_list),_ = check_ocr_box(
-                temp_path,
-                display_img=False,
-                output_bb_format='xyxy',
-                easyocr_args={'text_threshold':0.8},
-                use_paddleocr=False
+        with self._inference_context():
+            # One predict call for the whole chunk
+            yolo_results = predict_yolo_batch(
+                model=self._yolo_model,
+                images=images,
+                box_threshold=self._box_threshold,
+                iou_threshold=0.1,
+                rect=not self._yolo_static_shape
             )
-        except Exception as e:
-            print(f"OCR Failed {e}")
-            ocr_text_list = []
-            ocr_bbox_list = []
+
+        frames = [
+            (image, screenshot, yolo_result, ocr_future, ocr_skipped[index],
+             original_sizes[index] if original_sizes else image.size)
+            for index, (image, screenshot, yolo_result, ocr_future)
+            in enumerate(zip(images, screenshots, yolo_results, ocr_futures))
+        ]
+        if self._caption_batcher is not None and len(frames) > 1:
+            # Frames are labeled side by side so the caption batcher merges
+            # their icon crops into shared Florence-2 batches
+            return list(self._label_executor.map(lambda frame: self._label_frame(*frame), frames))
+        return [self._label_frame(*frame) for frame in frames]
+
+    def _label_frame(self, image:Image.Image, screenshot:Screenshot, yolo_result:Any, ocr_future:Optional[Future],
+                     ocr_skipped:bool, image_size:Tuple[int,int])->Tuple[List[VisualElement],str,Optional[Image.Image],bool]:
+        ocr_text_list = []
+        ocr_bbox_list = []
+        ocr_ran = ocr_skipped
+        if ocr_future is not None:
+            try:
+                (ocr_text_list, ocr_bbox_list),_ = ocr_future.result()
+                ocr_ran = True
+            except Exception as e:
+                print(f"OCR Failed {e}")
+                ocr_text_list = []
+                ocr_bbox_list = []
 
         box_overlay_ratio = max(image.size)/3200
         draw_bbox_config = {
@@ -189,32 +705,56 @@ class VisualAnalyzer:
             'thickness': max(int(3*box_overlay_ratio),1)
         }
 
-        try:
+        with self._inference_context():
             annotated_img, label_coords, parsed_content_list = get_som_labeled_img(
-                image_source=temp_path,
+                image_source=image,
                 model=self._yolo_model,
-                BOX_TRESHOLD=self.config.box_threshold,
+                BOX_TRESHOLD=self._box_threshold,
                 output_coord_in_ratio=True,
                 ocr_bbox=ocr_bbox_list,
                 draw_bbox_config=draw_bbox_config,
                 caption_model_processor=self._caption_model_processor,
                 ocr_text=ocr_text_list,
-                use_local_semantics=self.config.use_local_semantics,
+                use_local_semantics=self._use_local_semantics,
                 scale_img=False,
-                batch_size=128
+                batch_size=128,
+                image_format=self._annotated_image_format,
+                image_quality=self._annotated_image_quality,
+                yolo_result=yolo_result
             )
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            
+
         elements, text_content = self._parse_detection_results(
             parsed_content_list=parsed_content_list,
-            image_size = image.size,
+            image_size = image_size,
             screenshot=screenshot
         )
-        emit(EventType.VISUAL_ANALYSIS_COMPLETED, source="VisualAnalyzer", data = (elements,text_content,annotated_img), operation = "Get Labeled Image")
-        return elements,text_content,annotated_img
-    
+        self._emit_async(EventType.VISUAL_ANALYSIS_COMPLETED, source="VisualAnalyzer", data = (elements,text_content,annotated_img), operation = "Get Labeled Image")
+        return elements,text_content,annotated_img,ocr_ran
+
+    def _count_text_regions(self, image:Image.Image)->int:
+        # Cheap text estimate: glyph-sized blobs in an edge map of a 256 px
+        # wide grayscale copy. Icons come out as few large components.
+        arr = np.asarray(image)
+        height, width = arr.shape[:2]
+        small_height = max(int(height*256/width), 1)
+        gray = cv2.resize(cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY), (256, small_height), interpolation=cv2.INTER_AREA)
+        edges = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, np.ones((2,2), np.uint8))
+        _, mask = cv2.threshold(edges, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        text_like = (heights >= 2) & (heights <= 12) & (widths >= 2) & (widths <= 64) & (widths >= heights)
+        return int(np.count_nonzero(text_like))
+
+    @contextmanager
+    def _inference_context(self):
+        # Mixed precision on CUDA in the caption model's dtype; plain
+        # inference_mode elsewhere or when running fp32
+        autocast_dtype = self._torch_dtype
+        with torch.inference_mode(), torch.autocast(device_type=self._device, dtype=autocast_dtype,
+                                                    enabled=self._device == "cuda" and autocast_dtype != torch.float32):
+            yield
+
     def _parse_detection_results(self,
                                     parsed_content_list:List[Dict],
                                     image_size:Tuple[int,int],
@@ -226,184 +766,266 @@ class VisualAnalyzer:
         offset_x = screenshot.region[0] if screenshot.region else 0
         offset_y = screenshot.region[1] if screenshot.region else 0
 
-        for idx, item in enumerate(parsed_content_list):
-            if isinstance(item,(list,tuple)):
-                continue
-            if not isinstance(item,dict):
-                continue
-            
-            elem_type = item.get('type', 'unknown')
-            bbox_ratio = item.get('bbox',[0,0,0,0])
-            is_interactive = item.get('interactivity',False)
-            content = item.get('content',"") 
-            source = item.get('source', "")
+        indices = [idx for idx, item in enumerate(parsed_content_list) if isinstance(item,dict)]
+        if not indices:
+            return elements, ""
 
-            x1_pixel = int(bbox_ratio[0] * img_width)
-            y1_pixel = int(bbox_ratio[1] * img_height)
-            x2_pixel = int(bbox_ratio[2] * img_width)
-            y2_pixel = int(bbox_ratio[3] * img_height)
+        # Denormalize every bbox in one pass instead of per element
+        bbox_ratios = np.asarray(
+            [parsed_content_list[idx].get('bbox',[0,0,0,0]) for idx in indices],
+            dtype=np.float64
+        ).reshape(-1,4)
+        pixels = (bbox_ratios * np.array([img_width,img_height,img_width,img_height],dtype=np.float64)).astype(np.int64)
+        widths = pixels[:,2] - pixels[:,0]
+        heights = pixels[:,3] - pixels[:,1]
 
-            width = x2_pixel - x1_pixel
-            height = y2_pixel - y1_pixel
+        # Confidence depends only on the box source, so the threshold is
+        # applied to the whole batch before any element is built
+        sources = [parsed_content_list[idx].get('source', "") for idx in indices]
+        # Only a handful of distinct sources: look each up once, then broadcast
+        unique_sources, source_ids = np.unique(np.asarray(sources, dtype=str), return_inverse=True)
+        confidences = np.array([self._estimate_confidence(source) for source in unique_sources.tolist()],
+                               dtype=np.float64)[source_ids]
+        valid_rows = np.flatnonzero((widths>0) & (heights>0) & (confidences>=self._conf_threshold))
 
-            if width<=0 or height<=0:
-                continue
+        # Text covers every kept box, elements only the first max_elements.
+        # Those rows are ordered top-to-bottom, left-to-right before any
+        # element exists. The region offset is shared by every element, so
+        # pixel order matches screen order; lexsort is stable like list.sort.
+        element_rows = valid_rows[:self._max_elements]
+        if element_rows.size:
+            kept = pixels[element_rows]
+            element_rows = element_rows[np.lexsort((kept[:,0], kept[:,1]))]
 
-            screen_x = offset_x+ x1_pixel
-            screen_y = offset_y + y1_pixel
+        # Screen-space boxes and centers for the element rows in one pass
+        boxes = np.column_stack((
+            pixels[element_rows,0] + offset_x,
+            pixels[element_rows,1] + offset_y,
+            widths[element_rows],
+            heights[element_rows]
+        ))
+        centers = boxes[:,:2] + boxes[:,2:]//2
+        confidences = confidences.tolist()
 
-            center_x = screen_x + (width//2)
-            center_y = screen_y + (height//2)
+        labels: Dict[int,str] = {}
+        add_text = text_parts.append
+        for row in valid_rows.tolist():
+            content = parsed_content_list[indices[row]].get('content',"")
+            # Content is almost always str already; None (uncaptioned icon) is no label
+            if isinstance(content, str):
+                label = content.strip()
+            else:
+                label = str(content).strip() if content else ""
+            labels[row] = label
+            if label:
+                add_text(label)
 
-            confidence = self._estimate_confidence(source,elem_type)
+        # One timestamp per analysis; idx keeps the ids unique
+        timestamp_ms = int(time.time()*1000)
+        type_map_get = self._type_map.get
+        add_element = elements.append
+        make_element = VisualElement
 
-            if confidence<self.config.detection_confidence_threshold:
-                continue
+        for row, (screen_x, screen_y, width, height), (center_x, center_y) in zip(
+                element_rows.tolist(), boxes.tolist(), centers.tolist()):
+            idx = indices[row]
+            item = parsed_content_list[idx]
 
-            mapped_type = self._type_map.get(elem_type,"unknown")
+            elem_type = item.get('type', 'unknown')
+            bbox_ratio = item.get('bbox',[0,0,0,0])
+            is_interactive = item.get('interactivity',False)
+            source = sources[row]
+            label = labels[row]
+
+            mapped_type = type_map_get(elem_type,"unknown")
             if is_interactive and mapped_type == "unknown":
                 mapped_type = "button"
-            
-            label = str(content).strip()
-            if label:
-                text_parts.append(label)
 
-            element = VisualElement(
-                id=f"omni_{idx}_{int(time.time()*1000)}",
+            element = make_element(
+                id=f"omni_{idx}_{timestamp_ms}",
                 label=label,
                 element_type=mapped_type,
                 bounding_box=(screen_x,screen_y,width,height),
-                confidence=confidence,
+                confidence=confidences[row],
                 center=(center_x,center_y),
                 ocr_text=label if elem_type== 'text' else None,
-                attributes={
-                    'raw_type': elem_type,
-                    'source': source,
-                    'interactivity': is_interactive,
-                    'bbox_ratio': bbox_ratio,
-                    'index': idx
-                }
+                raw_type=elem_type,
+                source=source,
+                interactivity=is_interactive,
+                bbox_ratio=bbox_ratio,
+                index=idx
             )
-            elements.append(element)
-
-        max_elements = self.config.max_elements_per_analysis
-        elements = elements[:max_elements]
-        elements.sort(key=lambda e: (e.bounding_box[1], e.bounding_box[0]))
+            add_element(element)
 
         text_content = " | ".join(text_parts)
         # To add emit function
         return elements, text_content
     
-    def _estimate_confidence(self, source:str, elem_type:str)->float:
-        if source == 'box_ocr_content_ocr':
-            return 0.9
-        elif source=='box_yolo_content_ocr':
-            return 0.85
-        elif source == 'box_yolo_content_yolo':
-            return 0.75
-        else:
-            return 0.6
+    def _estimate_confidence(self, source:str)->float:
+        return self._CONFIDENCE_BY_SOURCE.get(source, 0.6)
     
     def _extract_text_only(self, image:Image.Image)->str:
-        temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-        temp_path = temp_file.name
-        temp_file.close()
-        image.save(temp_path)
-
         try:
             (ocr_text_list, ocr_bbox_list), _ = check_ocr_box(
-                temp_path,
+                np.asarray(image),
                 display_img=False,
                 output_bb_format='xyxy',
                 easyocr_args={'text_threshold':0.5},
                 use_paddleocr=False
             )
             text_content = " ".join(ocr_text_list) if ocr_text_list else ""
-            emit(event_type=EventType.OCR_COMPLETED, source="VisualAnalyzer", text_length = len(text_content))
+            self._emit_async(event_type=EventType.OCR_COMPLETED, source="VisualAnalyzer", text_length = len(text_content))
             return text_content
         except Exception as e:
-            emit(EventType.ERROR,source="VisualAnalyzer",error=str(e),operation = 'extract_text_only')
+            self._emit_async(EventType.ERROR,source="VisualAnalyzer",error=str(e),operation = 'extract_text_only')
             return ""
-        finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
         
     def find_element(self,screenshot:Screenshot, query: str, element_type:Optional[str]= None)->Optional[VisualElement]:
         result = self.analyze(screenshot)
         query_lower = query.lower()
-        for element in result.elements:
+        for element in self._iter_text_matches(result, query_lower):
             if element_type and element.element_type!= element_type:
                 continue
 
-            if query_lower in element.label.lower():
-                emit(EventType.VISUAL_ELEMENT_FOUND, source="VisualAnalyzer",query = query,element_type=element.element_type)
-                return element
-            
-            if element.ocr_text and query_lower in element.ocr_text.lower():
-                emit(EventType.VISUAL_ELEMENT_FOUND, source="VisualAnalyzer",query=query,found_via="ocr")
-                return element
+            if query_lower in element.label_lower:
+                self._emit_async(EventType.VISUAL_ELEMENT_FOUND, source="VisualAnalyzer",query = query,element_type=element.element_type)
+            else:
+                self._emit_async(EventType.VISUAL_ELEMENT_FOUND, source="VisualAnalyzer",query=query,found_via="ocr")
+            return element
 
-        emit(EventType.VISUAL_ELEMENT_NOT_FOUND,source="VisualAnalyzer",query=query)
+        self._emit_async(EventType.VISUAL_ELEMENT_NOT_FOUND,source="VisualAnalyzer",query=query)
         return None
 
     def find_all_elements(self,screenshot:Screenshot,query:Optional[str] = None, element_type:Optional[str] = None)-> List[VisualElement]:
         result = self.analyze(screenshot)
-        matches = []
         query_lower = query.lower() if query else None
-        
-        for element in result.elements:
-            if element_type and element.element_type != element_type:
-                continue
-            
-            if query_lower:
-                if query_lower not in element.label.lower():
-                    if not (element.ocr_text and query_lower in element.ocr_text.lower()):
-                        continue
-            
-            matches.append(element)
-        return matches
-    
+        if not query_lower:
+            if not element_type:
+                return list(result.elements)
+            elements = result.elements
+            type_rows = np.flatnonzero(self._element_arrays(result)['types'] == element_type)
+            return [elements[i] for i in type_rows.tolist()]
+
+        candidates = self._iter_text_matches(result, query_lower)
+        if not element_type:
+            return list(candidates)
+        return [element for element in candidates if element.element_type == element_type]
+
+    def _iter_text_matches(self, result:VisualAnalysisResult, query_lower:str):
+        # Yields, in element order, every element whose label or OCR text
+        # contains query_lower. The substring scan runs in str.find over one
+        # joined string instead of a Python-level `in` per element.
+        if "\0" in query_lower:
+            # Could straddle the separators; fall back to the plain scan
+            for element in result.elements:
+                if query_lower in element.label_lower or (element.ocr_text_lower and query_lower in element.ocr_text_lower):
+                    yield element
+            return
+
+        if not result.elements:
+            return
+        if result.search_index is None:
+            result.search_index = self._build_search_index(result.elements)
+        haystack, starts = result.search_index
+        elements = result.elements
+
+        find = haystack.find
+        pos = find(query_lower)
+        while pos != -1:
+            i = bisect_right(starts, pos) - 1
+            yield elements[i]
+            if i+1 >= len(starts):
+                return
+            pos = find(query_lower, starts[i+1])
+
+    def _build_search_index(self, elements:List[VisualElement])->Tuple[str,List[int]]:
+        parts = []
+        starts = []
+        pos = 0
+        for element in elements:
+            # NUL-separated so a query can't match across two fields; OCR
+            # text identical to the label is only indexed once
+            ocr_lower = element.ocr_text_lower
+            if ocr_lower is element.label_lower:
+                ocr_lower = None
+            text = f"{element.label_lower}\0{ocr_lower or ''}\0"
+            starts.append(pos)
+            parts.append(text)
+            pos += len(text)
+        return "".join(parts), starts
+
     def find_element_at_point(self, screenshot:Screenshot, x:int, y:int)->Optional[VisualElement]:
         result = self.analyze(screenshot)
 
-        candidates = []
-        for element in result.elements:
+        if result.spatial_index is None:
+            result.spatial_index = self._build_spatial_index(result.elements)
+
+        cell = self._spatial_cell_size
+        # Cells are ordered smallest box first, so the first hit is the answer
+        for element in result.spatial_index.get((x//cell, y//cell), ()):
             ex,ey,ew,eh = element.bounding_box
             if ex<=x and x<=ex+ew and ey<=y and y<=ey + eh:
-                area = ew*eh
-                candidates.append((area,element))
-        
-        if candidates:
-            candidates.sort(key=lambda c:c[0])
-            return candidates[0][1]
+                return element
         return None
+
+    def _build_spatial_index(self, elements:List[VisualElement])->Dict[Tuple[int,int], List[VisualElement]]:
+        cell = self._spatial_cell_size
+        index: Dict[Tuple[int,int], List[VisualElement]] = {}
+        # Stable sort keeps element order between boxes of equal area
+        for element in sorted(elements, key=lambda e: e.bounding_box[2]*e.bounding_box[3]):
+            ex,ey,ew,eh = element.bounding_box
+            # Edges are inclusive, so a box ending on a cell boundary also
+            # registers in the next cell
+            for cx in range(ex//cell, (ex+ew)//cell + 1):
+                for cy in range(ey//cell, (ey+eh)//cell + 1):
+                    index.setdefault((cx,cy), []).append(element)
+        return index
     
     def find_clickable_elements(self, screenshot:Screenshot)->List[VisualElement]:
         result = self.analyze(screenshot)
-        clickable = []
-        for element in result.elements:
-            if element.attributes.get('interactivity', False):
-                clickable.append(element)
-            elif element.element_type in ('button','icon', 'hyperlink'):
-                clickable.append(element)
-        return clickable
+        arrays = self._element_arrays(result)
+        mask = arrays['interactive'] | np.isin(arrays['types'], self._CLICKABLE_TYPES)
+        elements = result.elements
+        return [elements[i] for i in np.flatnonzero(mask).tolist()]
+
+    def _element_arrays(self, result:VisualAnalysisResult)->Dict[str,np.ndarray]:
+        # Column view of the elements, built once per result
+        if result.element_arrays is None:
+            elements = result.elements
+            result.element_arrays = {
+                'types': np.array([element.element_type for element in elements], dtype=str),
+                'interactive': np.fromiter((element.interactivity for element in elements), dtype=bool, count=len(elements))
+            }
+        return result.element_arrays
     
     def is_loaded(self)->bool:
         return self._models_loaded
     
-    def preload(self)->bool:
-        return self._load_models()
+    def preload(self, warm_up:bool = False)->bool:
+        return self._load_models(warm_up=warm_up)
+
+    def preload_async(self, warm_up:bool = True)->threading.Thread:
+        # Loads models in the background; an analyze() that arrives first
+        # blocks on _load_lock and then sees the loaded models
+        thread = threading.Thread(target=self.preload, kwargs={'warm_up':warm_up}, name="VisualAnalyzerPreload", daemon=True)
+        thread.start()
+        return thread
     
     def unload(self)->None:
         if self._yolo_model is not None:
             del self._yolo_model
             self._yolo_model = None
         
+        if self._caption_batcher is not None:
+            self._caption_batcher.stop()
+            self._caption_batcher = None
+
         if self._caption_model_processor is not None:
             del self._caption_model_processor
             self._caption_model_processor = None
         
         self._models_loaded = False
+        self.clear_cache()
 
         import gc
         gc.collect()
@@ -416,12 +1038,19 @@ class VisualAnalyzer:
         emit(EventType.OMNIPARSER_UNLOADED, source="VisualAnalyzer")
 
 _analyzer_instance: Optional["VisualAnalyzer"] = None
+_analyzer_lock = threading.Lock()
 
 
 def get_visual_analyzer()->VisualAnalyzer:
     global _analyzer_instance 
     if _analyzer_instance is None:
-        _analyzer_instance = VisualAnalyzer()
+        # Two threads racing here would each load YOLO and Florence-2
+        with _analyzer_lock:
+            if _analyzer_instance is None:
+                analyzer = VisualAnalyzer()
+                if analyzer.config.auto_preload:
+                    analyzer.preload_async()
+                _analyzer_instance = analyzer
     return _analyzer_instance
     
 
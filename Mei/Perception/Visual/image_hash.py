@@ -0,0 +1,27 @@
+from ...core.config import Screenshot
+from PIL import Image
+import numpy as np
+import cv2
+
+# Kept apart from screen.py so that hashing a Screenshot does not pull in
+# win32/mss or the capture module's process-wide setup
+
+def image_dhash(image)->int:
+    # 64-bit difference hash: one bit per horizontally adjacent pixel pair
+    # of a 9x8 grayscale thumbnail. Cursor blinks and small repaints move
+    # only a few bits.
+    if isinstance(image, np.ndarray):
+        small = cv2.resize(image, (9,8), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_RGBA2GRAY if small.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+    else:
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGB')
+        small = np.asarray(image.resize((9,8), Image.BOX).convert('L'))
+    bits = small[:,1:] > small[:,:-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def screenshot_dhash(screenshot:Screenshot)->int:
+    if screenshot.dhash is None:
+        screenshot.dhash = image_dhash(screenshot.image)
+    return screenshot.dhash
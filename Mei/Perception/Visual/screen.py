@@ -1,21 +1,99 @@
 from ...core.config import get_config, MonitorInfo, Screenshot, UIElement, ScreenDiff
 from ...core.events import emit, EventType
 from typing import List,Optional, Tuple
-import mss, os, ctypes
+import mss, os, ctypes, functools
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
 from PIL import Image
 import win32gui, win32con, win32ui, win32api 
 import time, numpy as np
+import cv2
+from .image_hash import screenshot_dhash
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _diff_mask(before, after, threshold):
+        # One pass over both frames: per-pixel channel distance, mask and
+        # changed-pixel count, without the int16 copies and temporaries
+        height, width = before.shape[0], before.shape[1]
+        mask = np.empty((height, width), dtype=np.uint8)
+        row_counts = np.zeros(height, dtype=np.int64)
+        for y in prange(height):
+            count = 0
+            for x in range(width):
+                distance = (abs(np.int32(before[y, x, 0]) - np.int32(after[y, x, 0]))
+                            + abs(np.int32(before[y, x, 1]) - np.int32(after[y, x, 1]))
+                            + abs(np.int32(before[y, x, 2]) - np.int32(after[y, x, 2])))
+                if distance > threshold:
+                    mask[y, x] = 1
+                    count += 1
+                else:
+                    mask[y, x] = 0
+            row_counts[y] = count
+        return mask, row_counts.sum()
+
+# Virtual-desktop geometry and monitor count; changes when displays are added, removed or moved
+_DISPLAY_METRICS = (win32con.SM_XVIRTUALSCREEN, win32con.SM_YVIRTUALSCREEN,
+                    win32con.SM_CXVIRTUALSCREEN, win32con.SM_CYVIRTUALSCREEN, win32con.SM_CMONITORS)
+
+def _write_image(image:Image.Image, path:str)->None:
+    # Codec follows the extension; unknown extensions still get PNG.
+    # Lossless WEBP at effort 0 encodes several times faster than zlib PNG.
+    fmt = Image.registered_extensions().get(os.path.splitext(path)[1].lower(), 'PNG')
+    if fmt == 'WEBP':
+        image.save(path, format='WEBP', lossless=True, method=0, quality=0)
+    elif fmt == 'PNG':
+        image.save(path, format='PNG', compress_level=1)
+    else:
+        image.save(path, format=fmt)
+
+@functools.lru_cache(maxsize=None)
+def _enable_dpi_awareness()->None:
+    # Once per process, by the first ScreenCapture rather than at import;
+    # repeating it is a no-op that still costs a syscall
+    try:
+        ctypes.windll.shcore.SetProcessDpiAwareness(2)
+    except:
+        pass
+
+@functools.lru_cache(maxsize=None)
+def _system_dpi_scale()->float:
+    # System DPI is fixed for the life of a DPI-aware process
+    return ctypes.windll.user32.GetDpiForSystem()/96.0
 
 class ScreenCapture:
     def __init__(self):
+        _enable_dpi_awareness()
         self.config = get_config()
         self._sct = mss.mss()
         self._monitors:List[MonitorInfo] = []
+        self._display_signature: Optional[Tuple[int,...]] = None
         self._refresh_monitors()
+        # Encodes and writes queued saves off the capture thread, in order
+        self._io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ScreenshotIO")
+        # Page-locked staging frame for capture_to_tensor(), reused while the
+        # monitor size stays the same; the event marks its last upload done
+        self._pinned_frame = None
+        self._pinned_upload = None
         os.makedirs(self.config.visual.screenshot_cache_dir, exist_ok= True)
 
+    def _read_display_signature(self)->Tuple[int,...]:
+        return tuple(win32api.GetSystemMetrics(metric) for metric in _DISPLAY_METRICS)
+
     def _refresh_monitors(self)->None:
+        self._display_signature = self._read_display_signature()
         self._monitors = []
         for i, mon in enumerate(self._sct.monitors[1:], start=0):
             monitor_info = MonitorInfo(
@@ -31,16 +109,14 @@ class ScreenCapture:
         emit(event_type= EventType.MONITOR_REFRESHED, source="ScreenCapture")
     
     def _get_dpi_scale(self, monitor_index: int)->float:
-        try:
-            ctypes.windll.shcore.SetProcessDpiAwareness(2)
-        except:
-            pass
-        user32 = ctypes.windll.user32
-        dpi = user32.GetDpiForSystem()
-        return dpi/96.0
+        return _system_dpi_scale()
     
     def get_monitors(self)->List[MonitorInfo]:
-        self._refresh_monitors()
+        if self._read_display_signature() != self._display_signature:
+            # mss caches its monitor list, so a display change needs a fresh instance
+            self._sct.close()
+            self._sct = mss.mss()
+            self._refresh_monitors()
         return list(self._monitors)
     
     def get_primary_monitor(self)->Optional[MonitorInfo]:
@@ -49,6 +125,11 @@ class ScreenCapture:
                 return monitor
         return self._monitors[0] if self._monitors else None
     
+    def _to_image(self, sct_img)->Image.Image:
+        # Decode mss's BGRA buffer in one C pass; sct_img.rgb reorders the
+        # channels in Python into an extra full-frame copy first
+        return Image.frombuffer('RGB', (sct_img.width, sct_img.height), sct_img.bgra, 'raw', 'BGRX', 0, 1)
+
     def capture_full_screen(self, monitor_index:int = None)-> Optional[Screenshot]:
         try:
             if monitor_index is None:
@@ -58,7 +139,7 @@ class ScreenCapture:
             monitor = self._sct.monitors[mss_index]
             sct_img = self._sct.grab(monitor)
 
-            img = Image.frombytes('RGB', (sct_img.width,sct_img.height), sct_img.rgb)
+            img = self._to_image(sct_img)
             
             S =  Screenshot(
                 image=img,
@@ -73,6 +154,34 @@ class ScreenCapture:
         except:
             emit(event_type=EventType.ERROR, source="ScreenCapture")
 
+    def capture_to_tensor(self, monitor_index:int = None, device:str = "cuda"):
+        # Grabs a monitor straight into a float RGB CHW tensor in [0, 1] on
+        # device, for GPU consumers that don't need a PIL image. The BGRA
+        # frame is copied once into pinned memory and uploaded asynchronously.
+        if not TORCH_AVAILABLE:
+            return None
+        try:
+            mss_index = 0 if monitor_index is None else monitor_index+1
+            sct_img = self._sct.grab(self._sct.monitors[mss_index])
+            frame = np.frombuffer(sct_img.bgra, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+
+            if not (device.startswith("cuda") and torch.cuda.is_available()):
+                host = torch.from_numpy(frame.copy())
+                return host[..., [2,1,0]].permute(2,0,1).float().div_(255.0)
+
+            if self._pinned_frame is None or self._pinned_frame.shape != frame.shape:
+                self._pinned_frame = torch.empty(frame.shape, dtype=torch.uint8, pin_memory=True)
+                self._pinned_upload = torch.cuda.Event()
+            else:
+                # The previous frame's async copy must finish before the buffer is overwritten
+                self._pinned_upload.synchronize()
+            self._pinned_frame.numpy()[...] = frame
+            gpu_frame = self._pinned_frame.to(device, non_blocking=True)
+            self._pinned_upload.record()
+            return gpu_frame[..., [2,1,0]].permute(2,0,1).float().div_(255.0)
+        except:
+            emit(event_type=EventType.ERROR, source="ScreenCapture")
+
     def capture_region(self,x:int, y:int,width:int, height:int)->Optional[Screenshot]:
         try:
             region = {
@@ -82,7 +191,7 @@ class ScreenCapture:
                 'height':height
             }
             sct_image = self._sct.grab(region)
-            img = Image.frombytes("RGB",(sct_image.width, sct_image.height),sct_image.rgb)
+            img = self._to_image(sct_image)
             S = Screenshot(
                 image=img,
                 timestamp=datetime.now(),
@@ -135,25 +244,31 @@ class ScreenCapture:
             hwnd_dc = win32gui.GetWindowDC(hwnd)
             mfc_dc = win32ui.CreateDCFromHandle(hwnd_dc)
             save_dc = mfc_dc.CreateCompatibleDC()
-
             bitmap = win32ui.CreateBitmap()
-            bitmap.CreateCompatibleBitmap(mfc_dc, width,height)
-            save_dc.SelectObject(bitmap)
-            
-            PW_RENDERFULLCONTENT  = 2
-            result = ctypes.windll.user32.PrintWindow(
-                hwnd, save_dc.GetSafeHdc(),PW_RENDERFULLCONTENT
-            )
-            bmp_info = bitmap.GetInfo()
-            bmp_bits = bitmap.GetBitmapBits(True)
-            
+            try:
+                bitmap.CreateCompatibleBitmap(mfc_dc, width,height)
+                save_dc.SelectObject(bitmap)
+                
+                PW_RENDERFULLCONTENT  = 2
+                result = ctypes.windll.user32.PrintWindow(
+                    hwnd, save_dc.GetSafeHdc(),PW_RENDERFULLCONTENT
+                )
+                bmp_info = bitmap.GetInfo()
+                bmp_bits = bitmap.GetBitmapBits(True)
+            finally:
+                # Freed before decoding, so the GDI bitmap, the copied bits
+                # and the decoded image are never all alive at once; also
+                # no longer leaked when PrintWindow or GetBitmapBits fails
+                win32gui.DeleteObject(bitmap.GetHandle())
+                save_dc.DeleteDC()
+                mfc_dc.DeleteDC()
+                win32gui.ReleaseDC(hwnd, hwnd_dc)
+
+            # The only pixel pass: BGRX bits decoded straight into the RGB image
             img = Image.frombuffer(
                 'RGB', (bmp_info['bmWidth'], bmp_info['bmHeight']), bmp_bits,'raw','BGRX', 0,1
             )
-            win32gui.DeleteObject(bitmap.GetHandle())
-            save_dc.DeleteDC()
-            mfc_dc.DeleteDC()
-            win32gui.ReleaseDC(hwnd, hwnd_dc)
+            del bmp_bits
             S =  Screenshot(image=img,
                             timestamp= datetime.now(),
                             region=(rect[0], rect[1], width, height),
@@ -195,16 +310,30 @@ class ScreenCapture:
             img_after = after.image
             if img_before.size != img_after.size:
                 img_after = img_after.resize(img_before.size)
+            # Both diff paths compare the same three colour channels; alpha
+            # (and single-channel frames) would otherwise be counted by one
+            # path and not the other
+            if img_before.mode != 'RGB':
+                img_before = img_before.convert('RGB')
+            if img_after.mode != 'RGB':
+                img_after = img_after.convert('RGB')
 
-            arr_before = np.array(img_before)
-            arr_after = np.array(img_after)
-            diff = np.abs(arr_before.astype(np.int16)-arr_after.astype(np.int16))
-            diff_sum = np.sum(diff, axis = 2)
-            changed_mask = diff_sum >30
+            arr_before = np.asarray(img_before)
+            arr_after = np.asarray(img_after)
+            # Hashed while the frames are at hand; analyze() reuses it for near-duplicate lookups
+            screenshot_dhash(before)
+            screenshot_dhash(after)
+            if NUMBA_AVAILABLE:
+                changed_mask, changed_pixels = _diff_mask(arr_before, arr_after, 30)
+            else:
+                # absdiff stays in uint8 (no int16 copies); the channel sum
+                # fits in uint16
+                diff_sum = cv2.absdiff(arr_before, arr_after).sum(axis=2, dtype=np.uint16)
+                changed_mask = diff_sum >30
+                changed_pixels = np.sum(changed_mask)
             changed_regions = self._find_changed_regions(changed_mask)
             
             total_pixels = arr_before.shape[0] * arr_before.shape[1] 
-            changed_pixels = np.sum(changed_mask)
             similarity = 1.0-(changed_pixels/total_pixels)
 
             S = ScreenDiff(
@@ -218,28 +347,48 @@ class ScreenCapture:
             emit(event_type=EventType.ERROR, source="ScreenCapture")
     
     
-    def _find_changed_regions(self,mask:np.ndarray)->List[Tuple[int,int,int,int]]:
-        rows,cols = np.where(mask)
-        if len(rows) == 0:
+    def _find_changed_regions(self,mask:np.ndarray, min_area:int = 1)->List[Tuple[int,int,int,int]]:
+        # One box per connected patch of change rather than a single box
+        # spanning every changed pixel on screen
+        # A bool mask is reinterpreted as uint8 in place rather than copied
+        mask = mask.view(np.uint8) if mask.dtype == np.bool_ else mask.astype(np.uint8, copy=False)
+        # boundingRect on the mask itself is one SIMD pass; labeling then only
+        # covers the changed area, and an unchanged frame stops here
+        left, top, width, height = cv2.boundingRect(mask)
+        if width == 0 or height == 0:
             return []
-        min_row, max_row = rows.min(), rows.max()
-        min_col, max_col = cols.min(), cols.max()
-        return [(min_col, min_row, max_col-min_col, max_row-min_row)]
+        roi = mask[top:top+height, left:left+width]
+        count, _, stats, _ = cv2.connectedComponentsWithStats(roi, connectivity=8)
+        regions = []
+        for x, y, w, h, area in stats[1:count].tolist():
+            if area >= min_area:
+                regions.append((x + left, y + top, w, h))
+        return regions
     
     def save_screenshot(self, screenshot:Screenshot, path:str = None)->Optional[str]:
         try:
             if path == None:
                 timestamp_str = screenshot.timestamp.strftime("%Y%m%d_%H%M%S_%f")
-                filename = f'screenshot_{timestamp_str}.png'
+                extension = self.config.visual.screenshot_save_format.lower()
+                filename = f'screenshot_{timestamp_str}.{extension}'
                 path = os.path.join(self.config.visual.screenshot_cache_dir, filename)
             
             os.makedirs(os.path.dirname(path), exist_ok = True)
-            screenshot.image.save(path, format='PNG')
+            _write_image(screenshot.image, path)
             emit(event_type=EventType.SCREENSHOT_SAVED, source="ScreenCapture", data = path)
             return path
         except:
             emit(event_type=EventType.ERROR, source="ScreenCapture")
 
+    def save_screenshot_async(self, screenshot:Screenshot, path:str = None)->Future:
+        # Returns at once; the Future resolves to what save_screenshot() returns
+        return self._io_pool.submit(self.save_screenshot, screenshot, path)
+
+    def flush(self)->None:
+        # Blocks until every queued save_screenshot_async() write is on disk
+        pool, self._io_pool = self._io_pool, ThreadPoolExecutor(max_workers=1, thread_name_prefix="ScreenshotIO")
+        pool.shutdown(wait=True)
+
     def load_screenshot(self, path:str)->Optional[Screenshot]:
         if not os.path.exists(path):
             return None
@@ -256,19 +405,18 @@ class ScreenCapture:
         )
     
     def cleanup_cache(self, max_age_hours:int = 24)->int:
-        now = datetime.now()
-        max_age_seconds = max_age_hours*3600
+        # Cutoff as a plain timestamp; scandir entries carry their file
+        # type and (on Windows) their stat info from the directory listing
+        cutoff = time.time() - max_age_hours*3600
         delete_count = 0
         cache_dir = self.config.visual.screenshot_cache_dir
-        for filename in os.listdir(cache_dir):
-            filepath = os.path.join(cache_dir, filename)
-            if not os.path.isfile(filepath):
-                continue
-            mtime = os.path.getmtime(filepath)
-            age_seconds = (now- datetime.fromtimestamp(mtime)).total_seconds()
-            if age_seconds > max_age_seconds:
-                os.remove(filepath)
-                delete_count +=1
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    delete_count +=1
         return delete_count
     
 
@@ -0,0 +1,61 @@
+from datetime import datetime
+from PIL import Image, ImageDraw
+from ...core.config import init_config, Screenshot, VisualAnalysisResult
+from .analyzer import VisualAnalyzer
+from .image_hash import screenshot_dhash
+
+
+def make_screenshot(text):
+    """A mostly blank 1280x720 frame with one line of text on it."""
+    image = Image.new('RGB', (1280, 720), 'white')
+    ImageDraw.Draw(image).text((100, 100), text, fill='black')
+    return Screenshot(image=image, timestamp=datetime.now(), region=(0, 0, 1280, 720), source='test')
+
+
+def make_result(screenshot):
+    return VisualAnalysisResult(screenshot=screenshot, elements=[], text_content="",
+                                analysis_time_ms=0.0, model_used="test", confidence_threshold=0.0)
+
+
+def main():
+    print("=" * 50)
+    print("  VISUAL ANALYZER CACHE TEST")
+    print("=" * 50)
+
+    print("\n[1] Loading config...")
+    config = init_config()
+    print(f"    perceptual_cache_distance: {config.visual.perceptual_cache_distance}")
+
+    print("\n[2] Creating analyzer (models are not loaded)...")
+    analyzer = VisualAnalyzer()
+
+    before = make_screenshot("Name: Alice")
+    after = make_screenshot("Name: Alicf")
+    distance = bin(screenshot_dhash(before) ^ screenshot_dhash(after)).count('1')
+    print(f"    dhash distance after a one-character edit: {distance} bits")
+
+    cache_key, cached = analyzer._lookup_cached(before, True, True)
+    assert cached is None
+    analyzer._store_cached_result(cache_key, make_result(before))
+
+    print("\n[3] Same pixels, new capture...")
+    _, cached = analyzer._lookup_cached(make_screenshot("Name: Alice"), True, True)
+    assert cached is not None, "identical frame should be served from the cache"
+    print("    ✓ Served from cache")
+
+    print("\n[4] One character of text changed...")
+    _, cached = analyzer._lookup_cached(after, True, True)
+    assert cached is None, "a changed frame must not reuse the previous elements"
+    print("    ✓ Not served from cache")
+
+    print("\n[5] Opt-in near-duplicate reuse...")
+    analyzer._perceptual_cache_distance = 64
+    _, cached = analyzer._lookup_cached(after, True, True)
+    assert cached is not None and cached.screenshot is after
+    print("    ✓ Reused when perceptual_cache_distance allows it")
+
+    print("\nTest complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 import pyaudio
+import itertools
+import math
+import queue
 import threading
 import time
 from datetime import datetime
@@ -8,6 +11,12 @@ import numpy as np
 from ...core import events
 from ...core.config import get_config
 
+try:
+    import webrtcvad
+    WEBRTCVAD_AVAILABLE = True
+except ImportError:
+    WEBRTCVAD_AVAILABLE = False
+
 # CHUNK = 1024
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
@@ -30,14 +39,35 @@ class AudioListener:
         self.rolling_buffer = deque(maxlen=max_chunks)
         
         
+        # PortAudio's thread hands each chunk over through this queue; the
+        # VAD loop runs on our own thread and never blocks capture
+        self._chunks = queue.SimpleQueue()
         self.pyaudio = pyaudio.PyAudio()
         self.stream = self.pyaudio.open(format = pyaudio.paInt16, 
                                         channels = self.channels, 
                                         rate = self.sample_rate, 
                                         input = True, 
-                                        frames_per_buffer= 1024)
-        self.speech_buffer = []
+                                        frames_per_buffer= self.CHUNK,
+                                        stream_callback = self._on_audio,
+                                        start = False)
+        # Utterance audio grows in place; emitted with a single bytes() copy
+        self._speech_ba = bytearray()
         self.silence_start_time = None
+        # Reused by calculate_rms; int64 so the sum of squares can't overflow
+        self._rms_buf = np.empty(self.CHUNK*self.channels, dtype=np.int64)
+        # rms > threshold  <=>  sum of squares > (threshold*32768)^2 * n, so the
+        # VAD compares integer energies without a sqrt or float division
+        self._threshold_sq_per_sample = (self.threshold*32768.0)**2
+        self._threshold_sq = self._threshold_sq_per_sample*self._rms_buf.size
+
+        # Steady fan or keyboard noise clears the energy threshold too; the
+        # VAD only runs on chunks that already did, so silence stays cheap
+        self._vad = None
+        if (WEBRTCVAD_AVAILABLE and config.audio.vad_aggressiveness >= 0 and self.channels == 1
+                and self.sample_rate in (8000, 16000, 32000, 48000)):
+            self._vad = webrtcvad.Vad(config.audio.vad_aggressiveness)
+            # 30 ms of int16 mono, the longest frame WebRTC VAD accepts
+            self._vad_frame_bytes = int(self.sample_rate*0.03)*2
 
 
     def start(self):
@@ -49,9 +79,16 @@ class AudioListener:
                                 daemon = True
                                 )
         self.thread.start()
+        self.stream.start_stream()
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        self._chunks.put(in_data)
+        return (None, pyaudio.paContinue)
 
     def stop(self):
         self.running = False
+        # Wakes the loop if it is waiting on an empty queue
+        self._chunks.put(None)
         if hasattr(self, 'thread') and self.thread.is_alive():
             self.thread.join(timeout=2.0)  # Add timeout to prevent hanging
 
@@ -64,33 +101,68 @@ class AudioListener:
 
 
     def calculate_rms(self, chunk):
-        chunk_array = np.frombuffer(chunk, dtype=np.int16).astype(np.float32)/32768.0
-        rms_value = np.sqrt(np.mean(chunk_array**2))
-        return rms_value
+        energy_sq, size = self._sum_squares(chunk)
+        if size == 0:
+            return 0.0
+        return math.sqrt(energy_sq/size)/32768.0
+
+    def _is_loud(self, chunk)->bool:
+        # Same decision as calculate_rms(chunk) > self.threshold
+        energy_sq, size = self._sum_squares(chunk)
+        if size == self._rms_buf.size:
+            return energy_sq > self._threshold_sq
+        return energy_sq > self._threshold_sq_per_sample*size
+
+    def _is_speech(self, chunk)->bool:
+        if not self._is_loud(chunk):
+            return False
+        step = self._vad_frame_bytes if self._vad is not None else 0
+        if step == 0 or len(chunk) < step:
+            return True
+        # Speech if any whole 30 ms frame of the chunk is speech
+        for start in range(0, len(chunk) - step + 1, step):
+            if self._vad.is_speech(chunk[start:start+step], self.sample_rate):
+                return True
+        return False
+
+    def _sum_squares(self, chunk):
+        # Sum of squares in the integer domain: no float32 copy per chunk
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        if samples.size == self._rms_buf.size:
+            buf = self._rms_buf
+            buf[:] = samples
+        else:
+            buf = samples.astype(np.int64)
+        return int(np.dot(buf, buf)), samples.size
 
     def _listen_loop(self):
         try:
             while self.running:
-                chunk = self.stream.read(self.CHUNK,exception_on_overflow=False)
+                chunk = self._chunks.get()
+                if chunk is None:
+                    break
                 # Adding to the rolling buffer.
                 self.rolling_buffer.append(chunk)
-                #calculating energy = 
-                energy = self.calculate_rms(chunk)
-                # print(f"RMS: {energy:.4f}")  # Shows 4 decimal places
+                loud = self._is_speech(chunk)
+                # print(f"RMS: {self.calculate_rms(chunk):.4f}")  # Shows 4 decimal places
 
                 if self.state == AgentState.IDLE:
-                    if energy>self.threshold:
+                    if loud:
                         self.state = AgentState.LISTENING
-                        pre_roll = list(self.rolling_buffer)[-5:]
-                        self.speech_buffer = pre_roll+ [chunk] 
+                        # Five chunks of pre-roll plus this one, which is
+                        # already the newest entry in the rolling buffer
+                        self._speech_ba.clear()
+                        start = max(len(self.rolling_buffer) - 6, 0)
+                        for pre_roll in itertools.islice(self.rolling_buffer, start, None):
+                            self._speech_ba += pre_roll
                         self.silence_start_time = None
 
                         events.emit(event_type=events.EventType.SPEECH_STARTED, source="AudioListener")
 
                 elif self.state == AgentState.LISTENING:
-                    self.speech_buffer.append(chunk)
+                    self._speech_ba += chunk
                     
-                    if energy>self.threshold:
+                    if loud:
                         # still speaking
                         self.silence_start_time = None
                     else:
@@ -98,10 +170,10 @@ class AudioListener:
                             self.silence_start_time = datetime.now() # current time supposidely
                         elif(datetime.now() - self.silence_start_time).total_seconds() > self.silence_duration:
                             # if silence long enough speech ended
-                            audio_data = b"".join(self.speech_buffer)
+                            audio_data = bytes(self._speech_ba)
 
                             events.emit(event_type = events.EventType.SPEECH_ENDED, source="AudioListener", audio=audio_data) # emit = return
-                            self.speech_buffer = []
+                            self._speech_ba.clear()
                             self.silence_start_time = None
                             self.state = AgentState.IDLE
         except Exception as e:
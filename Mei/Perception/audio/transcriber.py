@@ -1,14 +1,36 @@
 import os
+import sys
+import ctypes
 import threading
 import time
 import numpy as np
-from datetime import datetime
-from collections import deque
 import queue
-from faster_whisper import WhisperModel
+from bisect import bisect_right
 from ...core.config import get_config
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _i16_to_f32(samples, out):
+        # Convert-and-scale spread across cores; long clips are DRAM bound
+        scale = np.float32(1.0/32768.0)
+        for i in prange(samples.size):
+            out[i] = samples[i]*scale
+
+# Below this the thread fan-out costs more than NumPy's single pass
+_NUMBA_MIN_SAMPLES = 1 << 16
+
+# faster-whisper's default schedule, used for full (non-greedy) decodes
+_TEMPERATURE_FALLBACK = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
 from ...core.events import EventType, subscribe, emit
 
+# Relative model paths in the config are resolved against the project root
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../"))
 
 class Transcriber:
     def __init__(self):
@@ -17,21 +39,52 @@ class Transcriber:
         self.raw_path = config.audio.model_path.strip()
 
         if os.path.isabs(self.raw_path):
-            self.raw_path = self.raw_path
+            self.model_path = self.raw_path
         else:
-            self.current_dir = os.path.dirname(os.path.abspath(__file__))
-            self.current_dir = os.path.abspath(os.path.join(self.current_dir, "../../../"))
-            self.model_path = os.path.join(self.current_dir,self.raw_path)
+            self.model_path = os.path.join(_PROJECT_ROOT,self.raw_path)
+
+        # faster_whisper drags in ctranslate2 and tokenizers; importing it here
+        # keeps them off the startup path of code that never transcribes
+        from faster_whisper import WhisperModel
+        try:
+            from faster_whisper import BatchedInferencePipeline
+        except ImportError:
+            BatchedInferencePipeline = None
 
         self.rate = config.audio.sample_rate
         self.channel = config.audio.channels
-        self.model = WhisperModel(model_size_or_path = self.model_path, device = config.audio.device,compute_type= config.audio.compute_type)
+        self.model = WhisperModel(model_size_or_path = self.model_path, device = config.audio.device,
+                                  compute_type= self._compute_type(config.audio),
+                                  cpu_threads= self._cpu_threads())
         self.model_language = config.audio.language
         self.beam_size = config.audio.beam_size
+        self.batch_size = max(config.audio.transcribe_batch_size, 1)
+        self.double_vad = config.audio.double_vad
+        self.warmup = config.audio.warmup
+        self.short_utterance_samples = int(config.audio.short_utterance_seconds*self.rate)
+        self.batched = BatchedInferencePipeline(model=self.model) if BatchedInferencePipeline is not None else None
         self.running = False
-        self.queue = queue.Queue()
+        # One producer (the event bus) and one consumer; no task_done/join needed
+        self.queue = queue.SimpleQueue()
         self.thread = None
 
+    @staticmethod
+    def _compute_type(audio_config)->str:
+        # int8 weights cut weight bandwidth ~4x; on CUDA the remaining layers stay fp16
+        if audio_config.quantization == "int8":
+            return "int8_float16" if audio_config.device.startswith("cuda") else "int8"
+        return audio_config.compute_type
+
+    @staticmethod
+    def _cpu_threads()->int:
+        # One GEMM thread per physical core; SMT siblings share the same
+        # vector units. 0 leaves CTranslate2's own default.
+        try:
+            import psutil
+            return psutil.cpu_count(logical=False) or 0
+        except ImportError:
+            return 0
+
     def start(self):
         if self.running == True:
             return
@@ -56,44 +109,104 @@ class Transcriber:
             self.queue.put(audio_bytes)
 
 
+    def _warm_up(self):
+        # The first transcribe() pays for CTranslate2's CUDA/oneDNN kernel
+        # setup; a second of silence takes that hit before real speech does
+        try:
+            segments, _ = self.model.transcribe(
+                audio=np.zeros(self.rate, dtype=np.float32),
+                language=self.model_language,
+                beam_size=self.beam_size,
+                vad_filter=False,
+                condition_on_previous_text=False,
+                without_timestamps=True
+                )
+            list(segments)
+            if NUMBA_AVAILABLE:
+                # JIT (or on-disk cache load) for the read-only views
+                # np.frombuffer returns, here rather than at import
+                _i16_to_f32(np.frombuffer(bytes(2), dtype=np.int16), np.empty(1, dtype=np.float32))
+        except Exception as e:
+            print(f"Transcriber warmup failed: {e}")
+
     def _processing_loop(self):
+        if sys.platform == 'win32':
+            # Above normal, so the scheduler favours this thread (and the
+            # fast cores on hybrid CPUs) over background work
+            THREAD_PRIORITY_ABOVE_NORMAL = 1
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_ABOVE_NORMAL)
+        # On this thread, so start() returns at once; speech arriving
+        # meanwhile waits in the queue
+        if self.warmup:
+            self._warm_up()
         while self.running:
             try:
-                audio_bytes = self.queue.get(timeout=0.5)
-                if audio_bytes == None:
+                # Blocks until audio or the stop() sentinel arrives; no polling
+                audio_bytes = self.queue.get()
+                if audio_bytes is None:
                     break 
-                
-                if len(audio_bytes)<1600:
-                    continue
-                         
-                audio_data = self._convert_audio(audio_bytes)
-                self._transcribe_with_retry(audio_data)
+
+                # Whatever else queued up during the last transcription joins this one
+                batch = [audio_bytes]
+                stopping = False
+                while len(batch) < self.batch_size:
+                    try:
+                        extra = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if extra is None:
+                        stopping = True
+                        break
+                    batch.append(extra)
+
+                batch = [item for item in batch if len(item) >= 1600]
+                if len(batch) > 1 and self.batched is not None:
+                    self._transcribe_batch(batch)
+                else:
+                    for item in batch:
+                        self._transcribe_with_retry(self._convert_audio(item))
+                if stopping:
+                    break
 
                 
-            except queue.Empty:
-                continue
             except Exception as e:
                 emit(EventType.ERROR, source= 'Transcriber', error = str(e))
         
-    def _convert_audio(self, audio_bytes):
-        return np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+    def _convert_audio(self, audio_bytes, out=None):
+        # int16 -> scaled float32 in a single pass into the output array
+        # (astype and then / allocated and walked the audio twice). Without
+        # out, each call gets its own array.
+        samples = np.frombuffer(audio_bytes, dtype=np.int16)
+        audio = np.empty(samples.size, dtype=np.float32) if out is None else out
+        if NUMBA_AVAILABLE and samples.size >= _NUMBA_MIN_SAMPLES:
+            _i16_to_f32(samples, audio)
+        else:
+            np.multiply(samples, np.float32(1.0/32768.0), out=audio, casting='unsafe')
+        return audio
 
     def _transcribe_with_retry(self, audio_data, max_retries = 3):
+        # Short voice commands gain nothing from beam search but pay beam_size
+        # times the decoder work, so they decode greedily from the start
+        short = audio_data.shape[0] < self.short_utterance_samples
         for attempt in range(max_retries):
+            # A failed decode rarely succeeds by repeating it; retries fall back
+            # to greedy search without temperature fallback to bound their cost
+            greedy = short or attempt > 0
             try:
                 segments,info = self.model.transcribe(
                     audio=audio_data,
                     language=self.model_language,
-                    beam_size=self.beam_size, 
-                    vad_filter=True
+                    beam_size=1 if greedy else self.beam_size, 
+                    best_of=1 if greedy else 5,
+                    temperature=0.0 if greedy else _TEMPERATURE_FALLBACK,
+                    # The listener only emits speech-bounded clips, and only the text is used
+                    vad_filter=self.double_vad,
+                    condition_on_previous_text=False,
+                    without_timestamps=True
                     )
                 segments = list(segments)
-                full_text = " ".join([s.text for s in segments]).strip()
-                if full_text:
-                    print(f"Transcribtion Recognized: '{full_text}'")
-                    emit(EventType.TRANSCRIBE_COMPLETED, source = 'Transcriber', text = full_text, language = info.language)   
-                else:
-                    print("No speech detected in audio")
+                self._emit_text(" ".join([s.text for s in segments]).strip(), info.language)
                 return
             except Exception as e:
                 if attempt == max_retries -1:
@@ -103,4 +216,64 @@ class Transcriber:
 
         
 
-    
\ No newline at end of file
+    
+
+    def _transcribe_batch(self, batch):
+        # One batched Whisper pass over several utterances: they are laid end
+        # to end and each becomes its own clip (30 s windows at most), so the
+        # encoder and decoder run them as a single batch. Transcripts are
+        # emitted per utterance, in queue order.
+
+        # Each utterance is converted straight into its slice of the joint
+        # buffer, rather than into its own array that is then concatenated
+        lengths = [len(item)//2 for item in batch]
+        joined = np.empty(sum(lengths), dtype=np.float32)
+        audio_batch = []
+        offset = 0
+        for item, length in zip(batch, lengths):
+            view = joined[offset:offset+length]
+            self._convert_audio(item, out=view)
+            audio_batch.append(view)
+            offset += length
+
+        short = max(lengths) < self.short_utterance_samples
+        window = 30*self.rate
+        clips, owners = [], []
+        offset = 0
+        for index, audio in enumerate(audio_batch):
+            for start in range(0, len(audio), window):
+                end = min(start+window, len(audio))
+                clips.append({'start': (offset+start)/self.rate, 'end': (offset+end)/self.rate})
+                owners.append(index)
+            offset += len(audio)
+        clip_starts = [clip['start'] for clip in clips]
+
+        try:
+            segments, info = self.batched.transcribe(
+                joined,
+                language=self.model_language,
+                beam_size=1 if short else self.beam_size,
+                batch_size=len(clips),
+                vad_filter=False,
+                clip_timestamps=clips
+                )
+            texts = [[] for _ in audio_batch]
+            for segment in segments:
+                middle = (segment.start + segment.end)/2
+                clip = max(bisect_right(clip_starts, middle) - 1, 0)
+                texts[owners[clip]].append(segment.text)
+        except Exception as e:
+            print(f"Batched transcription failed, transcribing one by one: {e}")
+            for audio_data in audio_batch:
+                self._transcribe_with_retry(audio_data)
+            return
+
+        for parts in texts:
+            self._emit_text(" ".join(parts).strip(), info.language)
+
+    def _emit_text(self, full_text, language):
+        if full_text:
+            print(f"Transcribtion Recognized: '{full_text}'")
+            emit(EventType.TRANSCRIBE_COMPLETED, source = 'Transcriber', text = full_text, language = language)   
+        else:
+            print("No speech detected in audio")
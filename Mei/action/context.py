@@ -1,11 +1,25 @@
 from typing import Dict, Any, Optional, List
 from datetime import datetime
+from functools import lru_cache
+import sys
+import time
 from ..core.config import WindowInfo, ElementReference, ActionResult
 from ..core.task import Plan, Intent, Step
 from ..perception.System.windows import get_window_manager
 
 
+@lru_cache(maxsize=256)
+def _normalize_name(name:str)->str:
+    # Plans look the same few element names up step after step; each distinct
+    # name is lowered/stripped once and interned so dict keys compare by identity
+    return sys.intern(name.lower().strip())
+
+
 class ExecutionContext:
+    # Fixed attribute set: offset loads instead of a per-instance __dict__.
+    # Exactly the nine attributes __init__ sets; add new ones here too.
+    __slots__ = ('plan', 'intent', '_current_window', '_found_elements', 'step_results',
+                 'start_time', 'start_ns', 'current_step_index', 'variables')
 
     def __init__(self, plan:Plan, intent: Intent):
         self.plan  = plan
@@ -16,6 +30,8 @@ class ExecutionContext:
         self.step_results: List[ActionResult] = []
 
         self.start_time: datetime = datetime.now()
+        # Monotonic start for elapsed_time_ms(); start_time stays the wall-clock stamp
+        self.start_ns: int = time.perf_counter_ns()
 
         self.current_step_index: int = 0
 
@@ -48,22 +64,24 @@ class ExecutionContext:
         return None 
 
     def store_element(self,name:str, reference: ElementReference)->None:
-        normalized_name = name.lower().strip()
-        self._found_elements[normalized_name] = reference
+        self._found_elements[_normalize_name(name)] = reference
     
     def get_element(self, name:str)->Optional[ElementReference]:
-        normalized_name = name.lower().strip()
+        return self._lookup_element(_normalize_name(name))
+
+    def has_element(self, name:str)->bool:
+        return self._lookup_element(_normalize_name(name)) is not None
+
+    def _lookup_element(self, normalized_name:str)->Optional[ElementReference]:
         reference = self._found_elements.get(normalized_name)
         if reference is None:
             return None
         if reference.is_stale():
-            del self._found_elements[normalized_name]
+            # Stale references are dropped so the next lookup misses outright
+            self._found_elements.pop(normalized_name, None)
             return None
         return reference
 
-    def has_element(self, name:str)->bool:
-        return self.get_element(name) is not None
-
     def clear_elements(self)->None:
         self._found_elements.clear()
     
@@ -82,8 +100,7 @@ class ExecutionContext:
         return self.variables.get(key, default)
     
     def elapsed_time_ms(self)->float:
-        elapsed = datetime.now() - self.start_time
-        return elapsed.total_seconds()*1000
+        return (time.perf_counter_ns() - self.start_ns)/1e6
     
     def get_current_step(self)->Optional["Step"]:
         from ..core.task import Step
@@ -92,6 +109,7 @@ class ExecutionContext:
         return None
 
     def to_dict(self)->Dict[str,Any]:
+        window = self._current_window
         return {
             "intent":{
                 'action':self.intent.action,
@@ -112,10 +130,10 @@ class ExecutionContext:
                 ]
         },
         "current_window": {
-            'hwnd': self._current_window.hwnd,
-            'title': self._current_window.title,
-            'process': self._current_window.process_name
-        } if self._current_window else None,
+            'hwnd': window.hwnd,
+            'title': window.title,
+            'process': window.process_name
+        } if window else None,
         "current_step_index": self.current_step_index,
         "elapsed_ms": self.elapsed_time_ms(),
         'step_results': [
@@ -126,7 +144,7 @@ class ExecutionContext:
         } for r in self.step_results
         ],
         "variables": self.variables,
-        "cached_elements": list(self._found_elements.keys())
+        "cached_elements": list(self._found_elements)
         }
     
     
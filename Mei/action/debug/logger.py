@@ -1,5 +1,8 @@
+import atexit
 import json
 import os
+import queue
+import threading
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from pathlib import Path
@@ -7,10 +10,38 @@ from pathlib import Path
 from ...core.config import get_config, ActionResult
 from ..context import ExecutionContext
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
 DEFAULT_LOG_DIR = 'data/execution_logs'
-DEFAULT_LOG_FILE = 'execution_log.json'
+DEFAULT_LOG_FILE = 'execution_log.jsonl'
 MAX_LOG_ENTRIES = 1000
+# Buffered records are flushed and the metadata rewritten after this many
+# appended records (and at exit)
+METADATA_FLUSH_INTERVAL = 10
+LOG_BUFFER_SIZE = 64*1024
+# Pending writes before log_execution() waits on the writer thread
+LOG_QUEUE_SIZE = 1024
+
+
+def _dumps(data:Any, indent:bool = True)->bytes:
+    # orjson encodes in C several times faster than json.dump. indent=False
+    # gives a single line, as each JSON Lines record needs.
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, default=str, option=option)
+    if indent:
+        return json.dumps(data, indent=2, default=str).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+
+def _loads(raw:bytes)->Any:
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 class ExecutionLogger:
@@ -26,11 +57,14 @@ class ExecutionLogger:
         if log_file is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             log_file = f"execution_{timestamp}.log"
-            self.log_file = f"execution_{timestamp}.json"
+            self.log_file = f"execution_{timestamp}.jsonl"
         else:
             self.log_file = log_file
 
+        # Executions are appended one JSON object per line; the small
+        # metadata sidecar is the only file that gets rewritten
         self.log_path = self.log_dir / self.log_file
+        self.metadata_path = self.log_path.with_suffix('.meta.json')
         try:
             self.log_dir.mkdir(parents=True, exist_ok=True)
         except Exception as e:
@@ -38,8 +72,17 @@ class ExecutionLogger:
 
         self._log_data = self._load_or_create_log()
         self._session_id = self._generate_session_id()
+        self._unsaved_records = 0
+
+        # All file I/O happens on one writer thread; callers only serialize
+        # and enqueue. Items are (kind, payload) tuples, None stops it.
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._worker: Optional[threading.Thread] = threading.Thread(
+            target=self._drain, name="ExecutionLogWriter", daemon=True)
+        self._worker.start()
 
-        self._save_log()
+        self._save_metadata()
+        atexit.register(self.close)
 
     def _generate_session_id(self)-> str:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -52,18 +95,30 @@ class ExecutionLogger:
         return f"exec_{timestamp}_{unique}"
     
     def _load_or_create_log(self)->Dict[str,Any]:
+        metadata = None
+        if self.metadata_path.exists():
+            try:
+                metadata = _loads(self.metadata_path.read_bytes())
+            except (ValueError, IOError) as e:
+                print(f"Error loading log metadata: {e}")
+
+        executions = []
         if self.log_path.exists():
             try:
-                with open(self.log_path, 'r', encoding= 'utf-8') as f:
-                    data = json.load(f)
-                    if 'executions' in data and 'metadata' in data:
-                        return data
-            except (json.JSONDecodeError, IOError) as e:
+                with open(self.log_path, 'rb') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            executions.append(_loads(line))
+                        except ValueError:
+                            # A record cut short by a crash mid-write
+                            continue
+            except IOError as e:
                 print(f"Error loading log file: {e}")
 
-        return {
-            "executions": [],
-            "metadata": { 
+        if not isinstance(metadata, dict):
+            metadata = { 
                 "version":'1.0',
                 'created_at': datetime.now().isoformat(),
                 'last_updated': datetime.now().isoformat(),
@@ -71,34 +126,111 @@ class ExecutionLogger:
                 'total_success': 0,
                 'total_failures': 0
             }
+        return {
+            "executions": executions,
+            "metadata": metadata
         }
     
-    def _save_log(self)->bool:
-        self._log_data['metadata']['last_updated'] = datetime.now().isoformat()
-        self._log_data['metadata']['total_executions'] = len(self._log_data['executions'])
-
+    def _open_writer(self):
+        # One long-lived buffered handle: records collect in memory and
+        # reach the file in a single write() per flush
         try:
-            with open(self.log_path, 'w', encoding='utf-8') as f:
-                json.dump(self._log_data, f, indent=2, default= str)
-            return True
+            return open(self.log_path, 'ab', buffering=LOG_BUFFER_SIZE)
         except IOError as e:
-            print(f"Error saving log file: {e}")
-            return False
-    
-    def _rotate_if_needed(self)->None:
-        if len(self._log_data.get('executions', [])) < MAX_LOG_ENTRIES:
+            print(f"Error opening log file: {e}")
+            return None
+
+    def _drain(self)->None:
+        writer = self._open_writer()
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                writer = self._write_item(writer, *item)
+                # Buffered records reach the file once the burst is over
+                if writer is not None and self._queue.empty():
+                    writer.flush()
+            except Exception as e:
+                # Anything escaping here would kill the thread and leave
+                # log_execution(), flush() and close() waiting forever
+                print(f"Error writing log ({item[0]}): {e}")
+            finally:
+                self._queue.task_done()
+        if writer is not None:
+            writer.close()
+
+    def _write_item(self, writer, kind:str, payload):
+        if kind == 'record':
+            if writer is not None:
+                writer.write(payload)
+        elif kind == 'metadata':
+            with open(self.metadata_path, 'wb') as f:
+                f.write(payload)
+        elif kind == 'rotate':
+            writer = self._rotate_file(writer, payload)
+        return writer
+
+    def _submit(self, kind:str, payload)->None:
+        if self._worker is not None:
+            self._queue.put((kind, payload))
             return
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        archive_name = f'execution_log_{timestamp}.json'
-        archive_path = self.log_dir / archive_name
+        # After close() there is no writer thread; write on the caller
+        # rather than queue items nobody will take
+        writer = self._open_writer()
+        try:
+            writer = self._write_item(writer, kind, payload)
+        except Exception as e:
+            print(f"Error writing log ({kind}): {e}")
+        finally:
+            if writer is not None:
+                writer.close()
 
+    def _rotate_file(self, writer, archive_path:Path):
+        # Windows can't rename a file that is still open
+        if writer is not None:
+            writer.close()
         try:
             if self.log_path.exists():
                 self.log_path.rename(archive_path)
-                print(f"Rotated log to {archive_name}")
+                print(f"Rotated log to {archive_path.name}")
         except IOError as e:
-            print("Error rotating log: {e}")
-            return 
+            print(f"Error rotating log: {e}")
+        return self._open_writer()
+
+    def _append_record(self, record:Dict[str,Any])->None:
+        # O(record) per call, instead of rewriting every execution so far.
+        # Blocks only if the writer thread is LOG_QUEUE_SIZE writes behind.
+        self._submit('record', _dumps(record, indent=False) + b'\n')
+
+    def flush(self)->None:
+        # Returns once everything logged so far, and the metadata, is on disk
+        self._save_metadata()
+        if self._worker is not None:
+            self._queue.join()
+
+    def close(self)->None:
+        if self._worker is None:
+            return
+        self._save_metadata()
+        self._queue.put(None)
+        self._worker.join()
+        self._worker = None
+
+    def _save_metadata(self)->None:
+        self._log_data['metadata']['last_updated'] = datetime.now().isoformat()
+        self._log_data['metadata']['total_executions'] = len(self._log_data['executions'])
+        self._unsaved_records = 0
+        self._submit('metadata', _dumps(self._log_data['metadata']))
+    
+    def _rotate_if_needed(self)->None:
+        if len(self._log_data.get('executions', [])) < MAX_LOG_ENTRIES:
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        archive_name = f'execution_log_{timestamp}.jsonl'
+        self._submit('rotate', self.log_dir / archive_name)
+        # The archived records no longer belong to the live file
+        self._log_data['executions'] = []
     
     def log_execution(self, context:ExecutionContext, success:bool, failure_reason: Optional[str] = None)-> str:
         execution_id = self._generate_execution_id()
@@ -150,14 +282,17 @@ class ExecutionLogger:
                 'cached_element': list(context._found_elements.keys())
             }
         }
+        self._rotate_if_needed()
         self._log_data['executions'].append(record)
+        self._append_record(record)
         if success:
             self._log_data['metadata']['total_successes'] = self._log_data['metadata'].get('total_successes', 0) +1
         else:
             self._log_data['metadata']['total_failures'] = self._log_data['metadata'].get("total_failures", 0 ) + 1
 
-        self._rotate_if_needed()
-        self._save_log()
+        self._unsaved_records += 1
+        if self._unsaved_records >= METADATA_FLUSH_INTERVAL:
+            self._save_metadata()
         status = "Success" if success else "Failed"
         print(f" {status} execution id: {execution_id}, {context.intent.raw_command[:40]}, {context.elapsed_time_ms():.0f}ms")
 
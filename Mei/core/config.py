@@ -47,9 +47,23 @@ class AudioConfig:
     chunk: int = 1024
     channels: int = 1
     compute_type: str = "int8"
+    # 'int8' runs Whisper's linear layers through CTranslate2's int8 GEMMs
+    # (int8_float16 on CUDA, int8 on CPU); 'none' uses compute_type as is
+    quantization: str = "int8"
+    # Utterances that queue up while one is transcribing go through Whisper together
+    transcribe_batch_size: int = 8
+    # Run faster-whisper's Silero VAD again on clips the listener already cut at silence
+    double_vad: bool = False
+    # Decode a second of silence when the transcriber starts, before the first utterance
+    warmup: bool = True
+    # Utterances shorter than this decode greedily; beam_size applies to longer ones
+    short_utterance_seconds: float = 5.0
     language: str = 'en'
     beam_size: int = 5
     pre_roll_seconds: float = 2.0
+    # WebRTC VAD mode (0-3) that must confirm a loud chunk is speech;
+    # -1, or webrtcvad not installed, falls back to the energy threshold alone
+    vad_aggressiveness: int = 3
 
 @dataclass
 class KnownApps:
@@ -81,6 +95,11 @@ class WindowInfo:
     is_visible: bool
     is_minimized: bool
     is_maximized: bool
+    process_name_lower: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Lowered once here so bridge lookups and matching never re-lower it
+        self.process_name_lower = self.process_name.lower()
 
 @dataclass
 class TabInfo:
@@ -201,9 +220,59 @@ class VisualConfig:
 
     ocr_language:str = 'en'
     screenshot_cache_dir: str = 'data/screenshots'
+    # Codec for auto-named cache files: 'WEBP' (lossless, fastest effort) or 'PNG'
+    screenshot_save_format: str = 'WEBP'
     max_cache_size_mb: int = 100
     
     ocr_confidence_threshold:float = 0.6
+
+    # Codec for the annotated image returned by OmniParser: None hands back the
+    # PIL image in-process, 'JPEG'/'WEBP'/'PNG' return it base64-encoded
+    annotated_image_format: Optional[str] = None
+    annotated_image_quality: int = 90
+
+    # Screenshots larger than this (longest side, px) are downscaled before OCR/detection
+    max_analysis_dimension: int = 1920
+
+    # Letterbox every frame to YOLO's square input size, so window captures of
+    # any aspect ratio reuse one cuDNN algorithm choice and one engine profile
+    yolo_static_shape: bool = True
+
+    # YOLO precision on CUDA: 'fp16'/'int8' run a cached TensorRT engine, 'fp32' the .pt weights
+    yolo_precision: str = "fp16"
+    # Opt-in: build/use that engine only when the tensorrt package is already
+    # installed (otherwise the .pt weights run, and nothing is auto-installed)
+    yolo_tensorrt: bool = False
+
+    # Florence-2 weights: 'bf16' (falls back to fp16 without bf16 support) or
+    # 'fp16' on CUDA, 'int4'/'fp8' weight-only via torchao on CUDA (fp8 needs
+    # SM90+), 'int8' dynamic quantization on CPU, 'none' keeps fp32
+    caption_quantization: str = "bf16"
+
+    # OCR during detection: 'always', 'never', or 'auto' (skipped when a quick
+    # connected-component pass finds fewer than ocr_auto_min_text_regions text-like blobs)
+    ocr_mode: str = "always"
+    ocr_auto_min_text_regions: int = 3
+
+    # torch.compile the YOLO and Florence-2 forward passes on CUDA (slow first load)
+    compile_models: bool = False
+    # torch.compile backend: 'inductor', or 'tensorrt' (needs torch_tensorrt) for Florence-2
+    compile_backend: str = "inductor"
+
+    # How long the caption worker waits to merge crops from concurrent analyses (0 disables)
+    caption_batch_window_ms: float = 5.0
+
+    # Most screenshots analyze_batch() sends through YOLO in one predict call
+    analysis_batch_size: int = 8
+
+    # -1 (default) reuses cached results only for identical pixels. Opt-in:
+    # analyze() also reuses one whose screenshot dhash is within this many bits
+    # (same size and region). The hash covers the whole frame at 9x8, so typed
+    # text, a checkbox or a small popup can fall inside it and return stale elements
+    perceptual_cache_distance: int = -1
+
+    # Start loading (and warming up) OmniParser in the background when the analyzer is first created
+    auto_preload: bool = True
     
     region_around_cursor:List[int] = field(default_factory=lambda:[300,300])
 
@@ -225,8 +294,10 @@ class Screenshot:
     source: str
     source_hwnd:Optional[int] = None
     monitor_index: Optional[int] = None
+    # 64-bit difference hash of the frame, filled in on first use
+    dhash: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class VisualElement:
     id:str
     label:str
@@ -235,7 +306,25 @@ class VisualElement:
     confidence:float
     center: Tuple[int,int]
     ocr_text: Optional[str] = None
-    attributes: Dict[str, Any] = field(default_factory=dict)
+    # Detector details, kept as plain slots rather than a per-element dict
+    raw_type: str = "unknown"
+    source: str = ""
+    interactivity: bool = False
+    bbox_ratio: Optional[List[float]] = None
+    index: int = -1
+    label_lower: str = field(init=False, repr=False, compare=False)
+    ocr_text_lower: Optional[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Lowered once per analysis so find_* queries don't re-lower per call
+        self.label_lower = self.label.lower()
+        if not self.ocr_text:
+            self.ocr_text_lower = None
+        elif self.ocr_text == self.label:
+            # Text elements carry their OCR text as the label; share one lowered copy
+            self.ocr_text_lower = self.label_lower
+        else:
+            self.ocr_text_lower = self.ocr_text.lower()
 
 @dataclass
 class ScreenDiff:
@@ -252,6 +341,13 @@ class VisualAnalysisResult:
     model_used:str
     confidence_threshold: float
     annotated_image: Optional[Image.Image] = None
+    # Grid cell -> elements overlapping it; built lazily by find_element_at_point
+    spatial_index: Optional[Dict[Tuple[int,int], List[VisualElement]]] = field(default=None, repr=False, compare=False)
+    # Lowercased labels joined into one string plus each element's start offset;
+    # built lazily by find_element/find_all_elements
+    search_index: Optional[Tuple[str, List[int]]] = field(default=None, repr=False, compare=False)
+    # Per-element columns (NumPy arrays) for vectorized filters; built lazily by the analyzer
+    element_arrays: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
 
 @dataclass
 class LLMConfig:
@@ -177,6 +177,13 @@ class EventBus:
                 except ValueError:
                     pass
     
+    def has_subscribers(self, event_type: EventType) -> bool:
+        """Cheap check for hot paths: no handler will run for this event type.
+
+        Events should still be emitted so they reach get_history().
+        """
+        return bool(self._global_handlers) or bool(self._handlers.get(event_type))
+    
     def emit(self, event: Event) -> None:
         """Emit an event to all subscribers."""
         # Store in history
@@ -224,6 +231,11 @@ def emit(event_type: EventType, source: str = "unknown", **data) -> Event:
     return get_event_bus().emit_simple(event_type, source, **data)
 
 
+def has_subscribers(event_type: EventType) -> bool:
+    """Convenience function to check whether an event type has any listener."""
+    return get_event_bus().has_subscribers(event_type)
+
+
 def subscribe(event_type: EventType, handler: EventHandler) -> None:
     """Convenience function to subscribe to events."""
     get_event_bus().subscribe(event_type, handler)
\ No newline at end of file